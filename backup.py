@@ -0,0 +1,199 @@
+"""
+Backup module for Telegram CRM Bot
+Online, compressed SQLite backups with retention
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+
+# Incremental copies restarted this often fall back to a single-step copy
+MAX_RESTARTS = 5
+
+# One backup at a time per database file, whether scheduled or on demand;
+# tenants with different files back up concurrently
+_locks = {}  # absolute db_path -> threading.Lock
+_locks_guard = threading.Lock()
+
+
+def _lock_for(db_path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(db_path), threading.Lock())
+
+
+@dataclass
+class BackupResult:
+    """Outcome of one backup run"""
+
+    path: str
+    size: int
+    duration: float
+    pages: int
+    deleted: List[str]
+
+
+def _backup_name(db_path: str, when: datetime) -> str:
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return f"{stem}_{when.strftime(TIMESTAMP_FORMAT)}.db.gz"
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _copy(db_path: str, target: str, pages: int, sleep: float) -> int:
+    """
+    Copy a live database with the SQLite backup API
+
+    Each step copies `pages` pages under a short read lock; the progress
+    callback then sleeps with the lock released so writers can commit.
+    A write from another connection restarts the copy; after MAX_RESTARTS
+    the rest is copied in one step.
+
+    Returns:
+        Number of pages in the copy
+    """
+    restarts = 0
+    remaining_before = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, remaining_before
+        if remaining_before is not None and remaining > remaining_before:
+            restarts += 1
+            if restarts >= MAX_RESTARTS:
+                raise _TooManyRestarts
+        remaining_before = remaining
+        if remaining:
+            time.sleep(sleep)
+
+    source = sqlite3.connect(db_path)
+    destination = sqlite3.connect(target)
+    try:
+        try:
+            source.backup(destination, pages=pages, progress=progress, sleep=sleep)
+        except _TooManyRestarts:
+            logger.warning("Backup of %s restarted %d times, copying in one step", db_path, restarts)
+            source.backup(destination, pages=-1)
+        return destination.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        destination.close()
+        source.close()
+
+
+def prune_backups(backup_dir: str, db_path: str, keep_last: int, keep_daily: int,
+                  now: Optional[datetime] = None) -> List[str]:
+    """
+    Delete old backups of one database
+
+    Keeps the newest `keep_last` backups plus the newest backup of each
+    of the last `keep_daily` days.
+
+    Returns:
+        Paths of deleted files
+    """
+    now = now or datetime.now()
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    prefix, suffix = f"{stem}_", '.db.gz'
+
+    backups = []
+    for filename in os.listdir(backup_dir):
+        if not (filename.startswith(prefix) and filename.endswith(suffix)):
+            continue
+        try:
+            taken = datetime.strptime(filename[len(prefix):-len(suffix)], TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        backups.append((taken, os.path.join(backup_dir, filename)))
+    backups.sort(reverse=True)
+
+    oldest_daily = (now - timedelta(days=keep_daily)).date()
+    days_kept = set()
+    deleted = []
+    for index, (taken, path) in enumerate(backups):
+        if index < keep_last:
+            days_kept.add(taken.date())
+            continue
+        if taken.date() > oldest_daily and taken.date() not in days_kept:
+            days_kept.add(taken.date())
+            continue
+        os.remove(path)
+        deleted.append(path)
+    return deleted
+
+
+def backup_database(db_path: str, backup_dir: str, pages: int = 256, sleep: float = 0.01,
+                    keep_last: int = 7, keep_daily: int = 30) -> Optional[BackupResult]:
+    """
+    Take a compressed backup of a live SQLite database and apply retention
+
+    Blocking; run it with asyncio.to_thread from the bot.
+
+    Args:
+        db_path: Database file to back up
+        backup_dir: Directory for backups
+        pages: Pages copied per step
+        sleep: Seconds to pause between steps
+        keep_last: Most recent backups always kept
+        keep_daily: Days for which the newest backup of the day is kept
+
+    Returns:
+        The result, or None if a backup of this database is already running
+    """
+    lock = _lock_for(db_path)
+    if not lock.acquire(blocking=False):
+        return None
+    try:
+        started = time.perf_counter()
+        os.makedirs(backup_dir, exist_ok=True)
+        path = os.path.join(backup_dir, _backup_name(db_path, datetime.now()))
+        raw_path = path[:-len('.gz')] + '.tmp'
+
+        try:
+            page_count = _copy(db_path, raw_path, pages, sleep)
+            with open(raw_path, 'rb') as raw, gzip.open(path + '.tmp', 'wb', compresslevel=6) as compressed:
+                shutil.copyfileobj(raw, compressed, 1024 * 1024)
+            # Only complete backups ever carry the final name
+            os.replace(path + '.tmp', path)
+        finally:
+            for leftover in (raw_path, path + '.tmp'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        deleted = prune_backups(backup_dir, db_path, keep_last, keep_daily)
+        result = BackupResult(
+            path=path,
+            size=os.path.getsize(path),
+            duration=time.perf_counter() - started,
+            pages=page_count,
+            deleted=deleted
+        )
+        logger.info("Backed up %s to %s (%d bytes, %.1fs, %d old backups removed)",
+                    db_path, path, result.size, result.duration, len(deleted))
+        return result
+    finally:
+        lock.release()
+
+
+async def run_backup(db_path: str) -> Optional[BackupResult]:
+    """Back up a database off the event loop with the BACKUP_* settings"""
+    return await asyncio.to_thread(
+        backup_database, db_path, Config.BACKUP_DIR,
+        pages=Config.BACKUP_PAGES_PER_STEP,
+        sleep=Config.BACKUP_STEP_SLEEP_MS / 1000,
+        keep_last=Config.BACKUP_KEEP_LAST,
+        keep_daily=Config.BACKUP_KEEP_DAILY
+    )
@@ -0,0 +1,162 @@
+"""
+Synthetic lead datasets for database benchmarks
+Generates seeded, realistic leads tables of any size
+
+Usage:
+    python -m benchmarks.datagen --rows 1000000 --seed 42 --output leads_1m.db
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from typing import Iterator, Tuple
+
+# The bot modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, normalize_phone
+
+CHUNK_SIZE = 50000
+
+# (value, weight) distributions
+STATUS_WEIGHTS = [('COLD', 50), ('WARM', 35), ('HOT', 15)]
+LANGUAGE_WEIGHTS = [('en', 60), ('ru', 40)]
+SERVICE_WEIGHTS = [30, 20, 15, 15, 10, 10]  # same order as Config.SERVICES
+SERVICES = {
+    'en': ['Web Development', 'Mobile App', 'SEO & Marketing', 'Design', 'Consulting', 'Other'],
+    'ru': ['Веб-разработка', 'Мобильное приложение', 'SEO и маркетинг', 'Дизайн', 'Консультация', 'Другое']
+}
+DESCRIPTIONS = {
+    'HOT': ['Need this urgent, launch is next week', 'ASAP please, our site is down',
+            'Срочно нужен сайт', 'Нужно быстро, важно'],
+    'WARM': ['Planning a redesign soon', 'Interested in a quote for Q3',
+             'Планирую запуск приложения', 'Интересует продвижение'],
+    'COLD': ['Just looking', 'What are your prices?', 'Просто спрашиваю', 'Сколько стоит?']
+}
+FIRST_NAMES = ['Alex', 'Maria', 'Ivan', 'Olga', 'John', 'Anna', 'Dmitry', 'Elena', 'Sam', 'Kate']
+LAST_NAMES = ['Smith', 'Ivanov', 'Petrova', 'Brown', 'Sidorov', 'Kuznetsova', 'Lee', 'Popov']
+
+# Lead age in days follows an exponential distribution: recent days are
+# denser than old ones, with a hard cap of HISTORY_DAYS
+MEAN_AGE_DAYS = 60
+HISTORY_DAYS = 730
+
+
+def _weighted(rng: random.Random, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights)[0]
+
+
+def generate_rows(rows: int, seed: int, now: datetime) -> Iterator[Tuple]:
+    """
+    Yield lead rows with realistic distributions
+
+    Older leads are more likely to be contacted, archived and reminded,
+    mirroring how a live backlog ages.
+    """
+    rng = random.Random(seed)
+    service_indexes = list(range(len(SERVICE_WEIGHTS)))
+    # Repeat customers: some telegram_ids/phones appear more than once
+    customers = max(1, int(rows * 0.8))
+
+    for _ in range(rows):
+        status = _weighted(rng, STATUS_WEIGHTS)
+        language = _weighted(rng, LANGUAGE_WEIGHTS)
+        service = SERVICES[language][rng.choices(service_indexes, weights=SERVICE_WEIGHTS)[0]]
+        customer = rng.randrange(customers)
+        phone = f"+7999{customer:07d}"
+
+        age_days = min(rng.expovariate(1 / MEAN_AGE_DAYS), HISTORY_DAYS)
+        created_at = now - timedelta(days=age_days)
+        age_hours = age_days * 24
+
+        contacted = rng.random() < min(0.95, 0.3 + age_days / 10)
+        contacted_at = (created_at + timedelta(hours=rng.expovariate(1 / 6))) if contacted else None
+        archived = age_days > 30 and rng.random() < 0.5
+
+        yield (
+            100000000 + customer,
+            f"user{customer}" if rng.random() < 0.7 else None,
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            phone,
+            service,
+            rng.choice(DESCRIPTIONS[status]),
+            status,
+            language,
+            int(contacted),
+            int(archived),
+            created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            contacted_at.strftime('%Y-%m-%d %H:%M:%S') if contacted_at else None,
+            int(age_hours > 1 and (not contacted or rng.random() < 0.3)),
+            int(not contacted and age_hours > 24),
+            normalize_phone(phone)
+        )
+
+
+def generate_dataset(path: str, rows: int, seed: int = 42) -> str:
+    """
+    Create a SQLite database with `rows` synthetic leads
+
+    Returns:
+        The database path
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    # Creates the schema and indexes exactly as the bot does
+    Database._initialized_paths.discard(path)
+    Database(f"sqlite:///{path}")
+
+    conn = sqlite3.connect(path)
+    # Bulk-load settings; durability doesn't matter for throwaway data
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA journal_mode = MEMORY')
+
+    now = datetime.utcnow()
+    chunk = []
+    for row in generate_rows(rows, seed, now):
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            _insert(conn, chunk)
+            chunk = []
+    if chunk:
+        _insert(conn, chunk)
+
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _insert(conn, chunk):
+    conn.executemany('''
+        INSERT INTO leads (
+            telegram_id, telegram_username, name, phone, service, description,
+            status, language, contacted, archived, created_at, contacted_at,
+            first_reminder_sent, second_reminder_sent, phone_key
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', chunk)
+    conn.commit()
+
+
+def dataset_path(data_dir: str, rows: int, seed: int) -> str:
+    """Cache location for a dataset of a given size and seed"""
+    return os.path.join(data_dir, f"leads_{rows}_{seed}.db")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic leads database')
+    parser.add_argument('--rows', type=int, required=True)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', required=True, help='SQLite file to create (overwritten)')
+    args = parser.parse_args()
+
+    generate_dataset(args.output, args.rows, args.seed)
+    print(f"Generated {args.rows} leads in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
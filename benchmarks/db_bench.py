@@ -0,0 +1,202 @@
+"""
+Database micro-benchmarks for Telegram CRM Bot
+Times each Database method across dataset sizes and records query plans
+
+Usage:
+    python -m benchmarks.db_bench --sizes 1000,100000,1000000 --output current.json
+    python -m benchmarks.db_bench --baseline baseline.json --threshold 0.25
+
+Datasets are generated once per (size, seed) and cached in --data-dir.
+With --baseline, the run fails (exit code 1) when any method's median
+time regresses by more than --threshold relative to the baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+# The bot modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from benchmarks.datagen import generate_dataset, dataset_path
+
+DEFAULT_SIZES = '1000,10000,100000'
+
+# Regressions smaller than this are treated as timer noise
+MIN_REGRESSION_MS = 0.5
+
+
+class TracedDatabase(Database):
+    """Database that records every SQL statement executed while tracing"""
+
+    def __init__(self, *args, **kwargs):
+        self.statements = None
+        super().__init__(*args, **kwargs)
+
+    @contextmanager
+    def get_connection(self):
+        with super().get_connection() as conn:
+            if self.statements is not None:
+                conn.set_trace_callback(self.statements.append)
+            yield conn
+
+
+def capture_plans(db: TracedDatabase, call: Callable) -> List[Dict]:
+    """Run a call once and EXPLAIN QUERY PLAN every statement it issued"""
+    db.statements = []
+    try:
+        call()
+    finally:
+        statements, db.statements = db.statements, None
+
+    plans = []
+    seen = set()
+    with db.get_connection() as conn:
+        for sql in statements:
+            normalized = ' '.join(sql.split())
+            keyword = normalized.split(' ', 1)[0].upper()
+            if keyword not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH') or normalized in seen:
+                continue
+            seen.add(normalized)
+            rows = conn.execute(f'EXPLAIN QUERY PLAN {normalized}').fetchall()
+            plans.append({'sql': normalized, 'plan': [row[3] for row in rows]})
+    return plans
+
+
+def time_call(call: Callable, repeat: int) -> Dict:
+    """Run a call `repeat` times; returns timing stats in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'median_ms': round(statistics.median(samples), 3),
+        'min_ms': round(min(samples), 3),
+        'max_ms': round(max(samples), 3),
+        'repeat': repeat
+    }
+
+
+def benchmark_size(path: str, repeat: int, workdir: str) -> Dict:
+    """Benchmark every method against one dataset"""
+    db = TracedDatabase(f"sqlite:///{path}")
+    export_path = os.path.join(workdir, 'export.csv')
+    saved_ids = []
+
+    def save_lead():
+        saved_ids.append(db.save_lead(
+            1, 'bench', 'Bench User', '+79990000001', 'Web Development',
+            'benchmark lead, urgent', 'HOT'
+        ))
+
+    cases = {
+        'get_stats': lambda: db.get_stats(),
+        'get_recent_leads': lambda: db.get_recent_leads(limit=10),
+        'get_uncontacted_leads_1h': lambda: db.get_uncontacted_leads(hours=1, reminder_type=1),
+        'get_uncontacted_leads_24h': lambda: db.get_uncontacted_leads(hours=24, reminder_type=2),
+        'get_lead': lambda: db.get_lead(1),
+        'save_lead': save_lead,
+        'export_to_csv': lambda: db.export_to_csv(export_path),
+    }
+
+    results = {}
+    for name, call in cases.items():
+        plans = capture_plans(db, call)
+        results[name] = {**time_call(call, repeat), 'plans': plans}
+
+    # Keep the cached dataset unchanged for the next run
+    with db.get_connection() as conn:
+        conn.executemany('DELETE FROM leads WHERE id = ?', [(lead_id,) for lead_id in saved_ids])
+    if os.path.exists(export_path):
+        os.remove(export_path)
+
+    return results
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """List regressions of current results against a baseline"""
+    regressions = []
+    for size, methods in current['results'].items():
+        for name, stats in methods.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if not base:
+                continue
+            before, after = base['median_ms'], stats['median_ms']
+            if after > before * (1 + threshold) and after - before > MIN_REGRESSION_MS:
+                regressions.append(
+                    f"{name} @ {size} rows: {before:.3f} ms -> {after:.3f} ms "
+                    f"(+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Database methods across dataset sizes')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='Comma-separated row counts, e.g. 1000,100000,5000000')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per method')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'crm_bench_data'),
+                        help='Where generated datasets are cached')
+    parser.add_argument('--regenerate', action='store_true', help='Rebuild cached datasets')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--baseline', help='Fail if results regress against this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed relative slowdown against the baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix='crm_bench_')
+
+    current = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': __import__('sqlite3').sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat
+        },
+        'results': {}
+    }
+
+    for size in [int(value) for value in args.sizes.split(',') if value.strip()]:
+        path = dataset_path(args.data_dir, size, args.seed)
+        if args.regenerate or not os.path.exists(path):
+            print(f"Generating {size} rows...", file=sys.stderr)
+            generate_dataset(path, size, args.seed)
+
+        print(f"Benchmarking {size} rows...", file=sys.stderr)
+        current['results'][str(size)] = benchmark_size(path, args.repeat, workdir)
+        for name, stats in current['results'][str(size)].items():
+            print(f"  {name:<28} {stats['median_ms']:>10.3f} ms", file=sys.stderr)
+
+    output = json.dumps(current, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print('Performance regressions:', file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print('No regressions against baseline', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Fake Telegram Bot API server for load testing
+Serves getUpdates from an in-memory queue and acknowledges outgoing calls
+"""
+
+import json
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+BOT_USER = {
+    'id': 100000001,
+    'is_bot': True,
+    'first_name': 'LoadTestBot',
+    'username': 'load_test_bot',
+    'can_join_groups': False,
+    'can_read_all_group_messages': False,
+    'supports_inline_queries': False
+}
+
+# chat_id inside a multipart upload (sendDocument)
+_MULTIPART_CHAT_ID_RE = re.compile(rb'name="chat_id"\r\n\r\n(-?\d+)')
+
+
+class FakeBotAPI:
+    """
+    In-process stand-in for api.telegram.org
+
+    Start it, point the bot's base_url at `base_url`, then feed updates
+    with `push_updates`. Every call is counted per Bot API method.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, max_poll_wait: float = 1.0):
+        self.max_poll_wait = max_poll_wait
+        self.calls = Counter()
+        self._updates = deque()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._cond = threading.Condition()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # === Update feed ===
+
+    def push_updates(self, messages: List[Dict]):
+        """
+        Queue incoming messages as updates
+
+        Args:
+            messages: Dicts with user_id, text and optionally username
+        """
+        with self._cond:
+            for message in messages:
+                self._updates.append(self._make_update(message))
+            self._cond.notify_all()
+
+    def pending_updates(self) -> int:
+        with self._cond:
+            return len(self._updates)
+
+    def _make_update(self, message: Dict) -> Dict:
+        update_id = self._next_update_id
+        self._next_update_id += 1
+        text = message['text']
+        user_id = message['user_id']
+        payload = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {
+                'id': user_id,
+                'is_bot': False,
+                'first_name': f"User{user_id}",
+                'username': message.get('username', f"user{user_id}")
+            },
+            'text': text
+        }
+        if text.startswith('/'):
+            command = text.split()[0]
+            payload['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return {'update_id': update_id, 'message': payload}
+
+    def _get_updates(self, params: Dict) -> List[Dict]:
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = min(float(params.get('timeout') or 0), self.max_poll_wait)
+
+        with self._cond:
+            # Updates below the offset were confirmed by the bot
+            while self._updates and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            if not self._updates and timeout:
+                self._cond.wait(timeout)
+            return [update for _, update in zip(range(limit), self._updates)]
+
+    # === Outgoing calls ===
+
+    def _message(self, chat_id: int, **fields) -> Dict:
+        with self._cond:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            **fields
+        }
+
+    def handle(self, method: str, params: Dict, body: bytes) -> object:
+        """Produce the `result` for one Bot API call"""
+        self.calls[method] += 1
+
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            return self._get_updates(params)
+        if method == 'sendMessage':
+            return self._message(int(params.get('chat_id', 0)), text=params.get('text', ''))
+        if method == 'sendDocument':
+            match = _MULTIPART_CHAT_ID_RE.search(body)
+            chat_id = int(match.group(1)) if match else int(params.get('chat_id', 0))
+            return self._message(chat_id, document={
+                'file_id': 'doc', 'file_unique_id': 'doc', 'file_name': 'leads.csv'
+            })
+        if method in ('editMessageText', 'editMessageReplyMarkup'):
+            return self._message(int(params.get('chat_id', 0)), text=params.get('text', ''))
+        # deleteWebhook, answerCallbackQuery, setMyCommands, ...
+        return True
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body leave in one segment on flush; written
+            # separately on a keep-alive connection, Nagle's algorithm and
+            # the client's delayed ACK stall every call by ~40 ms
+            wbufsize = 64 * 1024
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client closed a pending long poll at shutdown
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                method = self.path.rstrip('/').rsplit('/', 1)[-1]
+                params = _parse_params(self.headers.get('Content-Type', ''), body)
+
+                response = json.dumps({'ok': True, 'result': api.handle(method, params, body)}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _parse_params(content_type: str, body: bytes) -> Dict:
+    """Decode form or JSON request parameters into a flat dict"""
+    if not body:
+        return {}
+    if content_type.startswith('application/json'):
+        return json.loads(body)
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        params = {}
+        for key, values in parse_qs(body.decode('utf-8')).items():
+            params[key] = _unquote_json(values[-1])
+        return params
+    return {}
+
+
+def _unquote_json(value: str) -> Optional[object]:
+    # python-telegram-bot JSON-encodes non-string parameter values
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
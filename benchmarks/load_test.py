@@ -0,0 +1,247 @@
+"""
+End-to-end load test for Telegram CRM Bot
+Drives simulated users through the lead flow against a fake Bot API server
+
+Usage:
+    python -m benchmarks.load_test --users 2000 --output results.json
+
+The bot runs with its real handlers, database layer and long polling; only
+api.telegram.org is replaced by benchmarks.fake_bot_api. Results are
+written as JSON so runs from different versions can be diffed.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+# The bot modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Benchmark settings must be in place before config is imported
+ADMIN_ID = 900000001
+BENCH_ENV = {
+    'TOKEN': '123456:LOADTEST',
+    'ADMIN_IDS': str(ADMIN_ID),
+    # Simulated users each send a short burst, keep flood control out of the way
+    'RATE_LIMIT_MESSAGE_BURST': '1000',
+    'RATE_LIMIT_LEAD_BURST': '1000',
+}
+
+USER_ID_BASE = 500000000
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float]) -> Dict:
+    """Latency summary in milliseconds"""
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0
+    }
+
+
+def build_script(users: int, admin_rounds: int, services: List[str]) -> List[Dict]:
+    """
+    Build the update stream
+
+    Conversations are interleaved step by step, so every user is
+    mid-flow at the same time, and admin commands are spread evenly
+    through the stream.
+    """
+    steps = [
+        lambda i: '/start',
+        lambda i: '👤 User',
+        lambda i: '📝 Leave Request',
+        lambda i: f"Load Test User {i}",
+        lambda i: f"+7999{i:07d}",
+        lambda i: services[i % len(services)],
+        lambda i: ('urgent, need it asap' if i % 3 == 0 else
+                   'planning a project soon' if i % 3 == 1 else
+                   'just looking around'),
+    ]
+    admin_commands = ['/leads', '/stats', '/export', '👑 Admin Panel (Demo)', '📋 View Leads', '📊 Statistics']
+
+    messages = []
+    for step in steps:
+        for i in range(users):
+            messages.append({'user_id': USER_ID_BASE + i, 'text': step(i), 'kind': 'user'})
+
+    if admin_rounds:
+        interval = max(1, len(messages) // (admin_rounds * len(admin_commands)))
+        position = interval
+        for _ in range(admin_rounds):
+            for command in admin_commands:
+                messages.insert(min(position, len(messages)),
+                                {'user_id': ADMIN_ID, 'text': command, 'kind': 'admin'})
+                position += interval + 1
+    return messages
+
+
+def instrument_database(db_class) -> Dict[str, List[float]]:
+    """Time every public Database method; returns the per-method samples"""
+    samples = defaultdict(list)
+
+    for name in dir(db_class):
+        method = getattr(db_class, name)
+        if name.startswith('_') or not callable(method) or name in ('get_connection', 'batch'):
+            continue
+
+        def wrap(func, label):
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    samples[label].append(time.perf_counter() - started)
+            return timed
+
+        setattr(db_class, name, wrap(method, name))
+
+    return samples
+
+
+async def run(args) -> Dict:
+    from telegram.ext import Application
+    from benchmarks.fake_bot_api import FakeBotAPI
+    from config import Config
+    import database
+    import bot
+    from tenancy import tenant_from_config
+
+    db_samples = instrument_database(database.Database)
+    update_latency = {}
+    kind_by_update = {}
+
+    class TimedApplication(Application):
+        """Application that records wall time spent per update"""
+
+        async def process_update(self, update):
+            started = time.perf_counter()
+            try:
+                await super().process_update(update)
+            finally:
+                update_latency[update.update_id] = time.perf_counter() - started
+
+    fake_api = FakeBotAPI()
+    fake_api.start()
+
+    application = (
+        Application.builder()
+        .application_class(TimedApplication)
+        .token(Config.TOKEN)
+        .base_url(fake_api.base_url)
+        .base_file_url(fake_api.base_url)
+        .job_queue(None)
+        .build()
+    )
+    application.bot_data['tenant'] = tenant_from_config()
+    bot.register_handlers(application)
+
+    messages = build_script(args.users, args.admin_rounds, Config.SERVICES['en'])
+    total = len(messages)
+    for update_id, message in enumerate(messages, start=1):
+        kind_by_update[update_id] = message['kind']
+
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+
+        started = time.perf_counter()
+        fake_api.push_updates(messages)
+        while len(update_latency) < total:
+            if time.perf_counter() - started > args.timeout:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+
+        await application.updater.stop()
+        await application.stop()
+        await bot.flush_writes(application)
+
+    fake_api.stop()
+
+    by_kind = defaultdict(list)
+    for update_id, latency in update_latency.items():
+        by_kind[kind_by_update.get(update_id, 'other')].append(latency)
+
+    handler_time = sum(update_latency.values())
+    db_time = sum(sum(values) for values in db_samples.values())
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'users': args.users,
+            'admin_rounds': args.admin_rounds,
+            'updates_sent': total
+        },
+        'throughput': {
+            'updates_processed': len(update_latency),
+            'elapsed_s': round(elapsed, 3),
+            'updates_per_sec': round(len(update_latency) / elapsed, 1) if elapsed else 0.0
+        },
+        'latency': {
+            'all': summarize(list(update_latency.values())),
+            **{kind: summarize(values) for kind, values in sorted(by_kind.items())}
+        },
+        'database': {
+            'time_share': round(db_time / handler_time, 4) if handler_time else 0.0,
+            'methods': {name: summarize(values) for name, values in sorted(db_samples.items())}
+        },
+        'bot_api_calls': dict(sorted(fake_api.calls.items()))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test against a fake Bot API')
+    parser.add_argument('--users', type=int, default=1000, help='Simulated users, one lead each')
+    parser.add_argument('--admin-rounds', type=int, default=5,
+                        help='Times the admin command set is interleaved into the stream')
+    parser.add_argument('--timeout', type=float, default=600, help='Give up after this many seconds')
+    parser.add_argument('--database', help='SQLite file to use (default: fresh temporary file)')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='crm_load_')
+    db_path = args.database or os.path.join(workdir, 'load_test.db')
+    os.environ.update(BENCH_ENV)
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    # Exports are written to the working directory
+    os.chdir(workdir)
+
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+
+    if results['throughput']['updates_processed'] < results['meta']['updates_sent']:
+        print('Not all updates were processed before the timeout', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,123 +3,209 @@ Main bot file for Telegram CRM Bot
 Handles bot initialization, job scheduling, and automation
 """
 
+import asyncio
 import logging
+import signal
+from collections import Counter
 from datetime import datetime, timedelta
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes
+from typing import List, Optional
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ContextTypes, TypeHandler
 from telegram.constants import ParseMode
 from config import Config, get_text
+from database import Lead, RETENTION_TABLES
 from handlers.user import get_handlers as user_get_handlers
+from handlers.admin import admin_handlers
+from rate_limiter import throttle_updates
+from metrics import REMINDERS_SENT, SEND_FAILURES, instrument_callback, start_metrics_server
+from transport import InstrumentedRequest, request_from_config
+import query_profiler
+from logging_setup import setup_logging
+from leader import LeaderLease, leader_only
+from backup import run_backup
+from tenancy import Tenant, get_tenant, load_tenants, tenant_from_config
+import lead_cards
+import settings
 
 # Setup logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+setup_logging(Config.LOG_LEVEL, Config.LOG_FORMAT, Config.LOG_DEDUP_SECONDS)
 logger = logging.getLogger(__name__)
 
 
 async def check_uncontacted_leads(context: ContextTypes.DEFAULT_TYPE):
     """
     Job to check for uncontacted leads and send reminders
-    Runs every 10 minutes
+    Runs every REMINDER_CHECK_INTERVAL seconds in the leader replica
     """
-    from database import Database
-    db = Database(Config.DATABASE_URL)
+    db = get_tenant(context).db
     
     logger.info("Checking for uncontacted leads...")
     
-    # Check for 1-hour uncontacted leads
-    one_hour_leads = db.get_uncontacted_leads(hours=1)
+    # Check for 1-hour uncontacted leads still waiting for a first reminder
+    one_hour_leads = db.get_uncontacted_leads(hours=1, reminder_type=1)
     
     for lead in one_hour_leads:
-        # Skip if first reminder already sent
-        if lead['first_reminder_sent']:
-            continue
-        
         # Send first reminder to admins
         await send_reminder_to_admins(context, lead, reminder_type=1)
         
         # Mark reminder as sent
-        db.mark_reminder_sent(lead['id'], 1)
+        await get_tenant(context).writes.mark_reminder_sent(lead.id, 1)
     
-    # Check for 24-hour uncontacted leads
-    twenty_four_hour_leads = db.get_uncontacted_leads(hours=24)
+    # Check for 24-hour uncontacted leads still waiting for a second reminder
+    twenty_four_hour_leads = db.get_uncontacted_leads(hours=24, reminder_type=2)
     
     for lead in twenty_four_hour_leads:
-        # Skip if second reminder already sent
-        if lead['second_reminder_sent']:
-            continue
-        
         # Send second reminder to admins
         await send_reminder_to_admins(context, lead, reminder_type=2)
         
         # Mark reminder as sent
-        db.mark_reminder_sent(lead['id'], 2)
+        await get_tenant(context).writes.mark_reminder_sent(lead.id, 2)
+
+
+async def move_archived_leads(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Job moving long-archived leads from leads to leads_archive
+    Each batch is its own short transaction, run off the event loop
+    """
+    db = get_tenant(context).db
+    moved = 0
+    while True:
+        batch = await asyncio.to_thread(
+            db.move_archived_leads, Config.ARCHIVE_AFTER_DAYS, Config.ARCHIVE_BATCH_SIZE
+        )
+        moved += batch
+        if batch < Config.ARCHIVE_BATCH_SIZE:
+            break
+    
+    if moved:
+        logger.info("Moved %d archived leads to cold storage", moved)
+
+
+async def purge_old_leads(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Job applying the retention policy to leads and language preferences
+    Each batch is its own short transaction, run off the event loop
+    """
+    db = get_tenant(context).db
+    anonymize = Config.RETENTION_MODE == 'anonymize'
+    purged = 0
+    for table in RETENTION_TABLES:
+        after = None
+        while True:
+            keys = await asyncio.to_thread(
+                db.purge_leads, table, Config.RETENTION_DAYS, Config.RETENTION_BATCH_SIZE,
+                anonymize, after
+            )
+            purged += len(keys)
+            if len(keys) < Config.RETENTION_BATCH_SIZE:
+                break
+            after = keys[-1]
+    
+    preferences = 0
+    while True:
+        batch = await asyncio.to_thread(
+            db.purge_user_preferences, Config.RETENTION_DAYS, Config.RETENTION_BATCH_SIZE
+        )
+        preferences += batch
+        if batch < Config.RETENTION_BATCH_SIZE:
+            break
+    
+    if purged or preferences:
+        logger.info("Retention: %s %d leads, deleted %d language preferences",
+                    'anonymized' if anonymize else 'deleted', purged, preferences)
+
 
+async def vacuum_job(context: ContextTypes.DEFAULT_TYPE):
+    """Job returning a bounded number of free database pages to the OS"""
+    db = get_tenant(context).db
+    released = await asyncio.to_thread(db.incremental_vacuum, Config.VACUUM_PAGES_PER_RUN)
+    if released:
+        logger.info("Incremental vacuum released %d pages", released)
 
-async def send_reminder_to_admins(context: ContextTypes.DEFAULT_TYPE, lead: dict, reminder_type: int):
+
+async def backup_job(context: ContextTypes.DEFAULT_TYPE):
+    """Job taking a scheduled online backup of the tenant's database"""
+    db = get_tenant(context).db
+    try:
+        result = await run_backup(db.db_path)
+    except Exception as e:
+        logger.error("Scheduled backup failed: %s", e, exc_info=e)
+        return
+    if result is None:
+        logger.info("Skipping scheduled backup: another backup is running")
+
+
+async def flush_funnel(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Job writing the funnel counts gathered since the last flush
+    Runs in every replica, since each counts its own users
+    """
+    tenant = get_tenant(context)
+    try:
+        await asyncio.to_thread(tenant.funnel.flush, tenant.db)
+    except Exception as e:
+        logger.error("Funnel flush failed, retrying next time: %s", e)
+
+
+async def send_reminder_to_admins(context: ContextTypes.DEFAULT_TYPE, lead: Lead, reminder_type: int):
     """
     Send reminder notification to admins
     
     Args:
         context: Telegram context
-        lead: Lead dictionary
+        lead: Lead record
         reminder_type: 1 for 1-hour, 2 for 24-hour
     """
-    lang = lead['language']
+    lang = lead.language
+    message = lead_cards.render(lead, 'reminder_1h' if reminder_type == 1 else 'reminder_24h', lang,
+                               get_tenant(context).cards)
     
-    # Get reminder message
-    if reminder_type == 1:
-        title = get_text(lang, 'reminder_1h')
-    else:
-        title = get_text(lang, 'reminder_24h')
-    
-    # Status emoji
-    status_emoji = {
-        'HOT': '🔥',
-        'WARM': '🌡',
-        'COLD': '❄️'
-    }
-    
-    # Format message
-    message = f"{title}\n\n"
-    message += f"**Lead #{lead['id']}**\n"
-    message += f"👤 {lead['name']}\n"
-    message += f"📱 {lead['phone']}\n"
-    message += f"🔧 {lead['service']}\n"
-    message += f"📝 {lead['description']}\n\n"
-    message += f"{status_emoji.get(lead['status'], '⚪️')} Status: {lead['status']}\n"
-    if lead['telegram_username']:
-        message += f"💬 @{lead['telegram_username']}\n"
-    message += f"🕐 Created: {lead['created_at']}"
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton(get_text(lang, 'contacted'), callback_data=f"contact_{lead.id}"),
+        InlineKeyboardButton(get_text(lang, 'archive'), callback_data=f"archive_{lead.id}")
+    ]])
     
     # Send to all admins
-    for admin_id in Config.ADMIN_IDS:
+    admin_ids = get_tenant(context).admins
+    failures = Counter()
+    for admin_id in admin_ids:
         try:
             await context.bot.send_message(
                 chat_id=admin_id,
                 text=message,
-                parse_mode=ParseMode.MARKDOWN
+                parse_mode=lead_cards.PARSE_MODE,
+                reply_markup=keyboard
             )
+            REMINDERS_SENT.labels(str(reminder_type)).inc()
         except Exception as e:
-            logger.error(f"Error sending reminder to admin {admin_id}: {e}")
+            logger.debug("Reminder for lead %s to admin %s failed: %s", lead.id, admin_id, e)
+            SEND_FAILURES.labels('reminder').inc()
+            failures[type(e).__name__] += 1
+    
+    if failures:
+        logger.error(
+            "Reminder for lead %s failed for %d of %d admins: %s",
+            lead.id, sum(failures.values()), len(admin_ids), dict(failures)
+        )
 
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Log errors caused by updates"""
-    logger.error(f"Update {update} caused error {context.error}")
+    update_id = update.update_id if isinstance(update, Update) else None
+    logger.error(
+        "Update %s caused error: %s", update_id, context.error,
+        exc_info=context.error, extra={'update_id': update_id}
+    )
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show help message"""
-    from database import Database
-    db = Database(Config.DATABASE_URL)
+    tenant = get_tenant(context)
     
     user = update.effective_user
-    lang = db.get_user_language(user.id)
+    lang = tenant.db.get_user_language(user.id)
     
-    if user.id in Config.ADMIN_IDS:
+    if tenant.is_admin(user.id):
         help_text = """
 🤖 **CRM Bot Commands**
 
@@ -147,9 +233,175 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
 
 
+async def flush_writes(application: Application):
+    """Commit writes and funnel counts still pending when the bot stops"""
+    tenant = application.bot_data['tenant']
+    await tenant.writes.close()
+    try:
+        await asyncio.to_thread(tenant.funnel.flush, tenant.db)
+    except Exception as e:
+        logger.error("Final funnel flush failed: %s", e)
+
+
+def reload_settings():
+    """Reload the live settings file; on errors the current settings stay"""
+    try:
+        settings.reload()
+    except ValueError as e:
+        logger.error("Settings not reloaded: %s", e)
+
+
+def watch_sighup():
+    """Reload the live settings on SIGHUP, where the platform has it"""
+    if hasattr(signal, 'SIGHUP'):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_settings)
+
+
+async def post_init(application: Application):
+    watch_sighup()
+
+
+def register_handlers(application: Application):
+    """Register all update and error handlers on an application"""
+    # Flood control runs before every other handler
+    application.add_handler(TypeHandler(Update, throttle_updates), group=-1)
+    
+    # Add handlers
+    application.add_handler(CommandHandler('help', help_command))
+    
+    # Add admin handlers (commands and inline lead actions)
+    for handler in admin_handlers:
+        application.add_handler(handler)
+    
+    # Add user handlers
+    for handler in user_get_handlers():
+        application.add_handler(handler)
+    
+    # Add error handler
+    application.add_error_handler(error_handler)
+    
+    # Per-handler latency and error metrics
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            callback = getattr(handler, 'callback', None)
+            if callback is None or getattr(callback, 'instrumented', False):
+                continue  # Handler objects are shared by every tenant's application
+            if asyncio.iscoroutinefunction(callback):
+                handler.callback = instrument_callback(callback)
+
+
+def build_application(tenant: Tenant, request: Optional[InstrumentedRequest] = None,
+                      get_updates_request: Optional[InstrumentedRequest] = None) -> Application:
+    """
+    Build the Application serving one tenant's bot
+    
+    Args:
+        tenant: Bot token, admins and storage
+        request: Request object for outbound calls (shared between tenants)
+        get_updates_request: Request object for long polling
+    
+    Returns:
+        Application with handlers and jobs registered
+    """
+    application = (
+        Application.builder()
+        .token(tenant.token)
+        .request(request or request_from_config('outbound'))
+        .get_updates_request(get_updates_request or request_from_config('updates'))
+        .post_init(post_init)
+        .post_stop(flush_writes)
+        .build()
+    )
+    application.bot_data['tenant'] = tenant
+    register_handlers(application)
+    
+    # Singleton jobs run only in the replica holding the tenant's lease
+    lease = LeaderLease(tenant.db, name=f"singleton-jobs:{tenant.name}",
+                        ttl=Config.LEADER_LEASE_TTL)
+    application.bot_data['lease'] = lease
+    job_queue = application.job_queue
+    job_queue.run_repeating(lease.heartbeat, interval=lease.ttl / 3, first=0,
+                            name='leader_heartbeat')
+    job_queue.run_repeating(leader_only(lease, check_uncontacted_leads),
+                            interval=Config.REMINDER_CHECK_INTERVAL, first=60,
+                            name='check_uncontacted_leads')
+    if Config.ARCHIVE_AFTER_DAYS > 0:
+        job_queue.run_repeating(leader_only(lease, move_archived_leads),
+                                interval=Config.ARCHIVE_INTERVAL, first=300,
+                                name='move_archived_leads')
+    if Config.RETENTION_DAYS > 0:
+        # A typo must not turn anonymization into deletion
+        if Config.RETENTION_MODE not in ('delete', 'anonymize'):
+            raise ValueError(f"RETENTION_MODE must be 'delete' or 'anonymize', not {Config.RETENTION_MODE!r}")
+        job_queue.run_repeating(leader_only(lease, purge_old_leads),
+                                interval=Config.RETENTION_INTERVAL, first=900,
+                                name='purge_old_leads')
+    # Online backups use the SQLite backup API; back up servers with pg_dump
+    if Config.BACKUP_INTERVAL > 0 and tenant.db.backend == 'sqlite':
+        job_queue.run_repeating(leader_only(lease, backup_job),
+                                interval=Config.BACKUP_INTERVAL, first=600,
+                                name='backup_job')
+    # PostgreSQL reclaims space with autovacuum
+    if Config.VACUUM_PAGES_PER_RUN > 0 and tenant.db.backend == 'sqlite':
+        job_queue.run_repeating(leader_only(lease, vacuum_job),
+                                interval=Config.VACUUM_INTERVAL, first=120,
+                                name='vacuum_job')
+    job_queue.run_repeating(flush_funnel, interval=Config.FUNNEL_FLUSH_INTERVAL,
+                            first=Config.FUNNEL_FLUSH_INTERVAL, name='flush_funnel')
+    return application
+
+
+async def run_tenants(tenants: List[Tenant]):
+    """
+    Serve several tenants' bots from the current event loop until SIGINT/SIGTERM
+    
+    All bots share one outbound connection pool and one long-polling pool.
+    A tenant that fails to start is logged and skipped.
+    """
+    request = request_from_config('outbound', shared=True)
+    # Every tenant holds one long-polling connection open
+    get_updates_request = request_from_config(
+        'updates', shared=True,
+        pool_size=max(Config.BOT_API_UPDATES_POOL_SIZE, len(tenants) + 1)
+    )
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    watch_sighup()
+    
+    running = []
+    try:
+        for tenant in tenants:
+            application = build_application(tenant, request, get_updates_request)
+            try:
+                await application.initialize()
+                await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+                await application.start()
+            except Exception as e:
+                logger.error("Tenant %s failed to start: %s", tenant.name, e)
+                continue
+            running.append(application)
+            logger.info("Tenant %s started (admins: %s, database: %s)",
+                        tenant.name, tenant.admins, tenant.database_url)
+        
+        if running:
+            await stop.wait()
+    finally:
+        for application in reversed(running):
+            await application.updater.stop()
+            await application.stop()
+            await flush_writes(application)
+            application.bot_data['lease'].release()
+            await application.shutdown()
+
+
 def main():
     """Main function to start the bot"""
-    import asyncio
     import sys
     import pytz
     
@@ -166,34 +418,33 @@ def main():
     try:
         # Create application with timezone
         tz = pytz.timezone(Config.TIMEZONE)
-        application = (
-            Application.builder()
-            .token(Config.TOKEN)
-            .job_queue(None)  # Disable job queue
-            .build()
-        )
         
-        # Add handlers
-        application.add_handler(CommandHandler('help', help_command))
+        if Config.METRICS_PORT:
+            start_metrics_server(Config.METRICS_HOST, Config.METRICS_PORT)
+        
+        if Config.SLOW_QUERY_MS is not None:
+            query_profiler.enable(Config.SLOW_QUERY_MS, Config.QUERY_PROFILE_TOP_N)
         
-        # Add user handlers
-        for handler in user_get_handlers():
-            application.add_handler(handler)
+        # An invalid settings file stops the bot here rather than in a handler
+        settings.reload()
         
-        # Add error handler
-        application.add_error_handler(error_handler)
+        # Multi-tenant mode: one Application per bot on this event loop
+        if Config.TENANTS_FILE:
+            tenants = load_tenants(Config.TENANTS_FILE)
+            logger.info("Serving %d tenants from %s", len(tenants), Config.TENANTS_FILE)
+            loop.run_until_complete(run_tenants(tenants))
+            return
         
-        # Note: Job queue disabled for now - can be enabled later
-        # job_queue = application.job_queue
-        # if job_queue:
-        #     job_queue.run_repeating(check_uncontacted_leads, interval=600, first=60)
+        tenant = tenant_from_config()
+        application = build_application(tenant)
         
         logger.info("Bot started successfully!")
-        logger.info(f"Admin IDs: {Config.ADMIN_IDS}")
-        logger.info(f"Database: {Config.DATABASE_URL}")
+        logger.info("Admin IDs: %s", tenant.admins)
+        logger.info("Database: %s", tenant.database_url)
         
         # Start polling
         application.run_polling(allowed_updates=Update.ALL_TYPES)
+        application.bot_data['lease'].release()
     finally:
         loop.close()
 
@@ -21,6 +21,33 @@ class Config:
     
     # Database settings
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///crm_bot.db')
+    # PostgreSQL connection pool, shared by all tenants on the same server
+    DATABASE_POOL_MIN_SIZE = int(os.getenv('DATABASE_POOL_MIN_SIZE', '1'))
+    DATABASE_POOL_MAX_SIZE = int(os.getenv('DATABASE_POOL_MAX_SIZE', '10'))
+    DATABASE_POOL_TIMEOUT = float(os.getenv('DATABASE_POOL_TIMEOUT', '5'))  # seconds to wait for a connection
+    
+    # Rendered lead cards kept in memory, keyed by lead version and language
+    LEAD_CARD_CACHE_SIZE = int(os.getenv('LEAD_CARD_CACHE_SIZE', '1024'))
+    
+    # Group commit: handler writes queued within this window share one transaction
+    WRITE_QUEUE_WINDOW_MS = float(os.getenv('WRITE_QUEUE_WINDOW_MS', '5'))
+    WRITE_QUEUE_MAX_BATCH = int(os.getenv('WRITE_QUEUE_MAX_BATCH', '100'))
+    # FULL, NORMAL or OFF: how long a commit waits for the disk (empty = backend default)
+    WRITE_SYNCHRONOUS = os.getenv('WRITE_SYNCHRONOUS', '').upper()
+    
+    # Lead form funnel: seconds between writes of the in-memory counts, /funnel default range
+    FUNNEL_FLUSH_INTERVAL = int(os.getenv('FUNNEL_FLUSH_INTERVAL', '60'))
+    FUNNEL_REPORT_DAYS = int(os.getenv('FUNNEL_REPORT_DAYS', '7'))
+    
+    # Days of time-to-contact quantiles shown by /stats (exports cover all days)
+    SLA_REPORT_DAYS = int(os.getenv('SLA_REPORT_DAYS', '30'))
+    
+    # Live settings: JSON file overriding HOT_KEYWORDS, WARM_KEYWORDS, SERVICES and
+    # ADMIN_IDS, reloaded on SIGHUP or /reload (see settings.example.json)
+    SETTINGS_FILE = os.getenv('SETTINGS_FILE', '')
+    
+    # Multi-tenant mode: JSON file listing several bots to serve from one process
+    TENANTS_FILE = os.getenv('TENANTS_FILE', '')
     
     # Timezone
     TIMEZONE = os.getenv('TIMEZONE', 'UTC')
@@ -29,6 +56,83 @@ class Config:
     FIRST_REMINDER_DELAY = 3600  # 1 hour
     SECOND_REMINDER_DELAY = 86400  # 24 hours
     
+    # Duplicate lead detection
+    DEFAULT_COUNTRY_CODE = os.getenv('DEFAULT_COUNTRY_CODE', '')  # e.g. '7' or '1'
+    DUPLICATE_WINDOW_HOURS = int(os.getenv('DUPLICATE_WINDOW_HOURS', '24'))  # 0 disables
+    MERGE_DUPLICATE_LEADS = os.getenv('MERGE_DUPLICATE_LEADS', 'false').lower() == 'true'
+    
+    # Flood control: action -> (sustained rate per minute, burst size)
+    RATE_LIMITS = {
+        'message': (
+            float(os.getenv('RATE_LIMIT_MESSAGES_PER_MINUTE', '30')),
+            int(os.getenv('RATE_LIMIT_MESSAGE_BURST', '10'))
+        ),
+        'lead': (
+            float(os.getenv('RATE_LIMIT_LEADS_PER_MINUTE', '0.2')),
+            int(os.getenv('RATE_LIMIT_LEAD_BURST', '3'))
+        ),
+    }
+    RATE_LIMIT_MAX_USERS = int(os.getenv('RATE_LIMIT_MAX_USERS', '10000'))
+    
+    # CSV import: rows per transaction
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '5000'))
+    
+    # Metrics endpoint (Prometheus text format); port 0 disables it
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+    
+    # Query profiling: log statements slower than this many ms; empty disables
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS')) if os.getenv('SLOW_QUERY_MS') else None
+    QUERY_PROFILE_TOP_N = int(os.getenv('QUERY_PROFILE_TOP_N', '10'))
+    
+    # /profile sampling profiler limits
+    PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '120'))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+    
+    # Logging
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' or 'json'
+    LOG_DEDUP_SECONDS = float(os.getenv('LOG_DEDUP_SECONDS', '60'))  # 0 disables
+    
+    # Leader lease for singleton jobs when running several replicas
+    LEADER_LEASE_TTL = float(os.getenv('LEADER_LEASE_TTL', '30'))
+    REMINDER_CHECK_INTERVAL = int(os.getenv('REMINDER_CHECK_INTERVAL', '600'))
+    
+    # Bot API transport: outbound calls and getUpdates long polling use separate pools
+    BOT_API_POOL_SIZE = int(os.getenv('BOT_API_POOL_SIZE', '256'))
+    BOT_API_UPDATES_POOL_SIZE = int(os.getenv('BOT_API_UPDATES_POOL_SIZE', '1'))
+    BOT_API_KEEPALIVE_SECONDS = float(os.getenv('BOT_API_KEEPALIVE_SECONDS', '30'))  # 0 disables
+    BOT_API_HTTP2 = os.getenv('BOT_API_HTTP2', 'false').lower() == 'true'
+    BOT_API_CONNECT_TIMEOUT = float(os.getenv('BOT_API_CONNECT_TIMEOUT', '5'))
+    BOT_API_READ_TIMEOUT = float(os.getenv('BOT_API_READ_TIMEOUT', '5'))
+    BOT_API_WRITE_TIMEOUT = float(os.getenv('BOT_API_WRITE_TIMEOUT', '5'))
+    BOT_API_POOL_TIMEOUT = float(os.getenv('BOT_API_POOL_TIMEOUT', '1'))
+    BOT_API_RETRIES = int(os.getenv('BOT_API_RETRIES', '3'))
+    BOT_API_RETRY_BACKOFF = float(os.getenv('BOT_API_RETRY_BACKOFF', '0.5'))  # seconds, doubled per attempt
+    
+    # Cold storage: archived leads older than this move to leads_archive (0 disables)
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+    ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', '3600'))
+    
+    # Retention: leads created more than this many days ago are deleted or anonymized (0 disables)
+    RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '0'))
+    RETENTION_MODE = os.getenv('RETENTION_MODE', 'delete').lower()  # delete or anonymize
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '500'))
+    RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', '3600'))
+    
+    # SQLite: free pages returned to the OS per vacuum run (0 disables)
+    VACUUM_PAGES_PER_RUN = int(os.getenv('VACUUM_PAGES_PER_RUN', '1000'))
+    VACUUM_INTERVAL = int(os.getenv('VACUUM_INTERVAL', '600'))
+    
+    # Online backups (SQLite backup API), gzip-compressed
+    BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+    BACKUP_INTERVAL = int(os.getenv('BACKUP_INTERVAL', '86400'))  # 0 disables scheduled backups
+    BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+    BACKUP_STEP_SLEEP_MS = float(os.getenv('BACKUP_STEP_SLEEP_MS', '10'))
+    BACKUP_KEEP_LAST = int(os.getenv('BACKUP_KEEP_LAST', '7'))
+    BACKUP_KEEP_DAILY = int(os.getenv('BACKUP_KEEP_DAILY', '30'))
+    
     # Services list
     SERVICES = {
         'en': [
@@ -90,11 +194,40 @@ class Config:
         'today': 'Today',
         'this_week': 'This week',
         'by_status': 'By status',
+        'by_service': 'By service',
+        'contact_time_title': 'Time to contact, last {days} days',
         'no_leads': 'No leads yet.',
         'lead_marked': 'Lead marked as contacted',
         'lead_archived': 'Lead archived',
         'reminder_1h': '⏰ REMINDER: Lead not contacted for 1 hour!',
         'reminder_24h': '⚠️ URGENT: Lead not contacted for 24 hours!',
+        'rate_limited': '⏳ You are sending requests too often. Please try again later.',
+        'select_leads': 'Select leads for a bulk action:',
+        'select_all': '☑️ All',
+        'clear_selection': '⬜️ None',
+        'assign_to_me': '👤 Assign to me',
+        'nothing_selected': 'No leads selected',
+        'selection_expired': 'This list has expired, open /leads again',
+        'leads_updated': 'Leads updated: {count}',
+        'import_send_file': '📥 Send the CSV file to import (same columns as /export).',
+        'import_started': '📥 Import started...',
+        'import_progress': '📥 Importing: {done} rows processed, {imported} imported',
+        'import_failed': '❌ Import failed. Imported batches are kept; send the same file again to resume.',
+        'dbprofile_off': 'Query profiling is off. Set SLOW_QUERY_MS to enable it.',
+        'dbprofile_empty': 'No queries recorded yet.',
+        'dbprofile_reset': '✅ Query profile cleared.',
+        'profile_usage': 'Usage: /profile <seconds> (1-{max})',
+        'profile_busy': '⏳ A profiling session is already running.',
+        'profile_started': '🔬 Profiling for {seconds} s...',
+        'backup_started': '💾 Backing up the database...',
+        'backup_done': '✅ Backup saved: {name}\nSize: {size:.1f} MB\nDuration: {duration:.1f} s',
+        'backup_busy': '⏳ A backup is already running.',
+        'backup_unsupported': 'ℹ️ The bot only backs up SQLite databases. Back up PostgreSQL with pg_dump.',
+        'backup_failed': '❌ Backup failed.',
+        'funnel_title': '📉 Lead form funnel, last {days} days',
+        'funnel_empty': 'No funnel data yet.',
+        'reload_done': '✅ Settings reloaded from {source}: {hot} hot and {warm} warm keywords, {services} services, {admins} admins.',
+        'reload_failed': '❌ Settings not reloaded, the previous ones stay in effect:\n{error}',
     },
     'ru': {
         'welcome': "👋 Добро пожаловать в наш Бизнес-Бот!\n\nМы помогаем бизнесу расти с помощью профессиональных услуг.\n\nПожалуйста, выберите язык:",
@@ -124,11 +257,40 @@ class Config:
         'today': 'Сегодня',
         'this_week': 'За неделю',
         'by_status': 'По статусу',
+        'by_service': 'По услуге',
+        'contact_time_title': 'Время до контакта за {days} дн.',
         'no_leads': 'Заявок пока нет.',
         'lead_marked': 'Заявка отмечена как обработанная',
         'lead_archived': 'Заявка архивирована',
         'reminder_1h': '⏰ НАПОМИНАНИЕ: С заявкой не связались уже час!',
         'reminder_24h': '⚠️ СРОЧНО: С заявкой не связались уже 24 часа!',
+        'rate_limited': '⏳ Вы отправляете заявки слишком часто. Пожалуйста, попробуйте позже.',
+        'select_leads': 'Выберите заявки для массового действия:',
+        'select_all': '☑️ Все',
+        'clear_selection': '⬜️ Сбросить',
+        'assign_to_me': '👤 Назначить на меня',
+        'nothing_selected': 'Заявки не выбраны',
+        'selection_expired': 'Список устарел, откройте /leads снова',
+        'leads_updated': 'Обновлено заявок: {count}',
+        'import_send_file': '📥 Отправьте CSV-файл для импорта (те же колонки, что в /export).',
+        'import_started': '📥 Импорт начат...',
+        'import_progress': '📥 Импорт: обработано строк {done}, импортировано {imported}',
+        'import_failed': '❌ Ошибка импорта. Загруженные части сохранены; отправьте тот же файл снова, чтобы продолжить.',
+        'dbprofile_off': 'Профилирование запросов выключено. Задайте SLOW_QUERY_MS, чтобы включить его.',
+        'dbprofile_empty': 'Запросы ещё не записаны.',
+        'dbprofile_reset': '✅ Профиль запросов очищен.',
+        'profile_usage': 'Использование: /profile <секунды> (1-{max})',
+        'profile_busy': '⏳ Профилирование уже запущено.',
+        'profile_started': '🔬 Профилирование {seconds} с...',
+        'backup_started': '💾 Создание резервной копии...',
+        'backup_done': '✅ Резервная копия сохранена: {name}\nРазмер: {size:.1f} МБ\nДлительность: {duration:.1f} с',
+        'backup_busy': '⏳ Резервное копирование уже выполняется.',
+        'backup_unsupported': 'ℹ️ Бот создаёт резервные копии только баз SQLite. Для PostgreSQL используйте pg_dump.',
+        'backup_failed': '❌ Ошибка резервного копирования.',
+        'funnel_title': '📉 Воронка формы заявки за {days} дн.',
+        'funnel_empty': 'Данных воронки пока нет.',
+        'reload_done': '✅ Настройки перезагружены из {source}: ключевых слов HOT {hot}, WARM {warm}, услуг {services}, администраторов {admins}.',
+        'reload_failed': '❌ Настройки не перезагружены, действуют прежние:\n{error}',
     }
 }
 
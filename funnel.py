@@ -0,0 +1,183 @@
+"""
+Funnel module for Telegram CRM Bot
+Counts how users move through the lead form, flushed as daily aggregates
+"""
+
+import bisect
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from database import Database
+import settings
+
+# Steps of the lead form in order; 'submitted' is the terminal step
+STEPS = ('name', 'phone', 'service', 'description', 'submitted')
+
+# Upper bounds in seconds of the time-in-step buckets; the last bucket is open
+TIME_BUCKETS = (2, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Stored as the bucket of events that carry no duration
+NO_BUCKET = -1
+
+
+def _service_label(service: str) -> str:
+    """Free-text answers to the service question are counted as 'other'"""
+    if not service:
+        return ''
+    return settings.current().service_label(service)
+
+
+class FunnelRecorder:
+    """
+    In-memory funnel counters for one bot
+
+    Handlers call enter()/advance()/abandon() as a user moves through the
+    form; each call only bumps a Counter. The flush job writes the
+    accumulated counts to funnel_daily in one upsert batch, so the table
+    holds one row per (day, language, service, step, event, bucket)
+    rather than one per event.
+
+    Per-user progress lives in the user's user_data under 'funnel_step'
+    and 'funnel_since'.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _record(self, user_data: Dict, step: str, event: str, bucket: int = NO_BUCKET):
+        lang = user_data.get('language', 'en')
+        key = (time.strftime('%Y-%m-%d', time.gmtime()), lang,
+               _service_label(user_data.get('service', '')), step, event, bucket)
+        with self._lock:
+            self._counts[key] += 1
+
+    def enter(self, user_data: Dict, step: str):
+        """The user was asked for `step`; an unfinished step counts as restarted"""
+        if user_data.get('funnel_step'):
+            self.abandon(user_data, 'restart')
+        if step == STEPS[0]:
+            user_data.pop('service', None)
+        self._record(user_data, step, 'enter')
+        if step == STEPS[-1]:
+            return
+        user_data['funnel_step'] = step
+        user_data['funnel_since'] = time.monotonic()
+
+    def advance(self, user_data: Dict, next_step: str):
+        """The user answered the current step and was asked for `next_step`"""
+        step = user_data.pop('funnel_step', None)
+        since = user_data.pop('funnel_since', None)
+        if step is not None:
+            elapsed = time.monotonic() - since
+            self._record(user_data, step, 'complete', bisect.bisect_left(TIME_BUCKETS, elapsed))
+        self.enter(user_data, next_step)
+
+    def abandon(self, user_data: Dict, event: str):
+        """
+        The user left the form: 'cancel', 'back', 'restart' or 'blocked'
+        (rate limited). Does nothing outside the form.
+        """
+        step = user_data.pop('funnel_step', None)
+        user_data.pop('funnel_since', None)
+        if step is not None:
+            self._record(user_data, step, event)
+
+    def flush(self, db: Database) -> int:
+        """
+        Add the pending counts to funnel_daily; on failure they are kept
+        for the next flush
+
+        Returns:
+            Number of aggregate rows written
+        """
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+        try:
+            db.add_funnel_counts([key + (count,) for key, count in counts.items()])
+        except Exception:
+            with self._lock:
+                self._counts.update(counts)
+            raise
+        return len(counts)
+
+
+def median_seconds(buckets: Dict[int, int]) -> Optional[float]:
+    """
+    Median time from bucket counts, interpolated within the median's bucket
+
+    Returns:
+        Seconds, or None without samples
+    """
+    total = sum(buckets.values())
+    if not total:
+        return None
+    half = total / 2
+    seen = 0
+    for bucket in sorted(buckets):
+        count = buckets[bucket]
+        if seen + count >= half:
+            lower = TIME_BUCKETS[bucket - 1] if bucket > 0 else 0
+            upper = TIME_BUCKETS[bucket] if bucket < len(TIME_BUCKETS) else lower * 2
+            return lower + (upper - lower) * (half - seen) / count
+        seen += count
+    return None
+
+
+def summarize(rows: List[Dict]) -> Dict:
+    """
+    Turn funnel_daily rows into per-language and per-service funnels
+
+    Args:
+        rows: Dicts with language, service, step, event, bucket, count
+
+    Returns:
+        {'languages': {lang: [step summary, ...]},
+         'services': {service: summary of the description step}},
+        where a step summary has step, entered, completed, cancelled,
+        conversion (share that reached the next step) and median seconds
+    """
+    entered = defaultdict(Counter)     # dimension -> step -> count
+    left = defaultdict(Counter)        # dimension -> (step, event) -> count
+    times = defaultdict(Counter)       # dimension -> (step, bucket) -> count
+
+    for row in rows:
+        dimensions = [('language', row['language'])]
+        if row['service']:
+            dimensions.append(('service', row['service']))
+        for dimension in dimensions:
+            if row['event'] == 'enter':
+                entered[dimension][row['step']] += row['count']
+            else:
+                left[dimension][(row['step'], row['event'])] += row['count']
+            if row['bucket'] != NO_BUCKET:
+                times[dimension][(row['step'], row['bucket'])] += row['count']
+
+    def step_summary(dimension, step, next_step):
+        step_times = {bucket: count for (name, bucket), count in times[dimension].items() if name == step}
+        count = entered[dimension][step]
+        return {
+            'step': step,
+            'entered': count,
+            'completed': left[dimension][(step, 'complete')],
+            'cancelled': left[dimension][(step, 'cancel')] + left[dimension][(step, 'back')],
+            'conversion': entered[dimension][next_step] / count if count and next_step else None,
+            'median': median_seconds(step_times)
+        }
+
+    languages = {
+        value: [step_summary((kind, value), step, next_step)
+                for step, next_step in zip(STEPS, STEPS[1:] + (None,))]
+        for kind, value in entered if kind == 'language'
+    }
+    # Steps before the service question don't know the service yet
+    services = {
+        value: step_summary((kind, value), 'description', 'submitted')
+        for kind, value in entered if kind == 'service'
+    }
+    return {'languages': languages, 'services': services}
+
@@ -4,35 +4,55 @@ Admin handlers for Telegram CRM Bot
 Handles admin commands, statistics, and lead management
 """
 
-from telegram import Update
-from telegram.ext import ContextTypes, CommandHandler
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler, MessageHandler, filters
+from telegram.helpers import escape_markdown
 from config import Config, get_text
-from database import Database
+from database import Database, NO_TELEGRAM_ID
+from importer import import_csv, format_summary, CSVImportError
+from metrics import SEND_FAILURES
+from tenancy import get_tenant
+import query_profiler
+import lead_cards
+import sampling_profiler
+from backup import run_backup
+from funnel import summarize
+import settings
+import sla
+import asyncio
+from collections import Counter
+import functools
+import io
 import logging
+import os
+import tempfile
+import time
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-# Initialize database lazily  
-db = None
+# How many lead lists per admin keep their selection state
+MAX_TRACKED_SELECTIONS = 5
 
-def init_db():
-    global db
-    if db is None:
-        db = Database(Config.DATABASE_URL)
-    return db
+# Minimum seconds between import progress message edits
+IMPORT_PROGRESS_INTERVAL = 3
 
+def init_db(context: ContextTypes.DEFAULT_TYPE) -> Database:
+    """Database of the tenant the update belongs to"""
+    return get_tenant(context).db
 
-def is_admin(user_id: int) -> bool:
-    """Check if user is an admin"""
-    return user_id in Config.ADMIN_IDS
+
+def is_admin(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Check if user is an admin of this tenant's bot"""
+    return get_tenant(context).is_admin(user_id)
 
 
 def admin_only(func):
     """Decorator to restrict commands to admins only"""
+    @functools.wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
-        if not is_admin(user.id):
+        if not is_admin(user.id, context):
             return
         return await func(update, context)
     return wrapper
@@ -41,7 +61,7 @@ def admin_only(func):
 @admin_only
 async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show admin menu"""
-    init_db()
+    db = init_db(context)
     lang = db.get_user_language(update.effective_user.id)
     
     await update.message.reply_text(get_text(lang, 'admin_menu'))
@@ -50,7 +70,7 @@ async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 @admin_only
 async def show_leads(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show recent leads"""
-    init_db()
+    db = init_db(context)
     user = update.effective_user
     lang = db.get_user_language(user.id)
     
@@ -61,33 +81,138 @@ async def show_leads(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(get_text(lang, 'no_leads'))
         return
     
-    # Format leads
-    message = "📋 **Recent Leads**\n\n"
+    await update.message.reply_text(lead_cards.render_list(leads, lang, get_tenant(context).cards), parse_mode=lead_cards.PARSE_MODE)
+    await send_lead_selection(update, context, [lead.id for lead in leads], lang)
+
+
+def build_lead_selection_keyboard(lead_ids: list, selected: set, lang: str) -> InlineKeyboardMarkup:
+    """
+    Build the multi-select keyboard for a lead list
     
-    for lead in leads:
-        status_emoji = {
-            'HOT': '🔥',
-            'WARM': '🌡',
-            'COLD': '❄️'
-        }
-        
-        contacted_emoji = '✅' if lead['contacted'] else '⏳'
-        
-        message += f"{status_emoji.get(lead['status'], '⚪️')} **Lead #{lead['id']}** {contacted_emoji}\n"
-        message += f"👤 {lead['name']}\n"
-        message += f"📱 {lead['phone']}\n"
-        message += f"🔧 {lead['service']}\n"
-        message += f"📝 {lead['description'][:50]}...\n"
-        message += f"🕐 {lead['created_at']}\n"
-        message += "─" * 30 + "\n\n"
+    Args:
+        lead_ids: Leads shown in the list
+        selected: Leads currently selected
+        lang: Admin's language
+    """
+    toggles = [
+        InlineKeyboardButton(
+            f"{'☑️' if lead_id in selected else '⬜️'} #{lead_id}",
+            callback_data=f"sel:{lead_id}"
+        )
+        for lead_id in lead_ids
+    ]
+    keyboard = [toggles[i:i + 5] for i in range(0, len(toggles), 5)]
+    keyboard.append([
+        InlineKeyboardButton(get_text(lang, 'select_all'), callback_data='sel:all'),
+        InlineKeyboardButton(get_text(lang, 'clear_selection'), callback_data='sel:none')
+    ])
+    keyboard.append([
+        InlineKeyboardButton(get_text(lang, 'contacted'), callback_data='bulk:contact'),
+        InlineKeyboardButton(get_text(lang, 'archive'), callback_data='bulk:archive'),
+        InlineKeyboardButton(get_text(lang, 'assign_to_me'), callback_data='bulk:assign')
+    ])
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def send_lead_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, 
+                              lead_ids: list, lang: str):
+    """Send the bulk-action keyboard for a list of leads"""
+    if not lead_ids:
+        return
     
-    await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+    message = await update.message.reply_text(
+        get_text(lang, 'select_leads'),
+        reply_markup=build_lead_selection_keyboard(lead_ids, set(), lang)
+    )
+    
+    # Selection state per list message; only the newest few are kept
+    selections = context.user_data.setdefault('lead_selections', {})
+    selections[message.message_id] = {'ids': list(lead_ids), 'selected': set()}
+    while len(selections) > MAX_TRACKED_SELECTIONS:
+        selections.pop(next(iter(selections)))
+
+
+async def lead_actions_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle inline lead actions
+    
+    sel:<id>|all|none toggles the selection of a lead list, bulk:<action>
+    applies an action to every selected lead in one transaction, and
+    contact_<id> / archive_<id> act on a single lead.
+    """
+    db = init_db(context)
+    query = update.callback_query
+    user = update.effective_user
+    
+    if not is_admin(user.id, context):
+        await query.answer()
+        return
+    
+    lang = db.get_user_language(user.id)
+    data = query.data
+    writes = get_tenant(context).writes
+    
+    # Single-lead buttons on notifications and reminders
+    if data.startswith(('contact_', 'archive_')):
+        action, lead_id = data.split('_', 1)
+        if action == 'contact':
+            await writes.mark_contacted_many([int(lead_id)])
+            await query.answer(get_text(lang, 'lead_marked'))
+        else:
+            await writes.archive_leads([int(lead_id)])
+            await query.answer(get_text(lang, 'lead_archived'))
+        await query.edit_message_reply_markup(reply_markup=None)
+        return
+    
+    selection = context.user_data.get('lead_selections', {}).get(query.message.message_id)
+    if selection is None:
+        await query.answer(get_text(lang, 'selection_expired'))
+        return
+    
+    selected = selection['selected']
+    kind, _, value = data.partition(':')
+    
+    if kind == 'sel':
+        if value == 'all':
+            selected.update(selection['ids'])
+        elif value == 'none':
+            selected.clear()
+        else:
+            selected.symmetric_difference_update({int(value)})
+        await query.answer()
+        await query.edit_message_reply_markup(
+            reply_markup=build_lead_selection_keyboard(selection['ids'], selected, lang)
+        )
+        return
+    
+    if not selected:
+        await query.answer(get_text(lang, 'nothing_selected'))
+        return
+    
+    lead_ids = sorted(selected)
+    if value == 'contact':
+        count = await writes.mark_contacted_many(lead_ids)
+    elif value == 'archive':
+        count = await writes.archive_leads(lead_ids)
+    elif value == 'assign':
+        count = await writes.assign_leads(lead_ids, user.id)
+    else:
+        await query.answer()
+        return
+    
+    selected.clear()
+    await query.answer(get_text(lang, 'leads_updated').format(count=count))
+    await query.edit_message_text(
+        f"{get_text(lang, 'leads_updated').format(count=count)}: "
+        + ', '.join(f"#{lead_id}" for lead_id in lead_ids)
+    )
+    context.user_data['lead_selections'].pop(query.message.message_id, None)
 
 
 @admin_only
 async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show CRM statistics"""
-    init_db()
+    db = init_db(context)
     user = update.effective_user
     lang = db.get_user_language(user.id)
     
@@ -108,19 +233,36 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
             }
             message += f"{status_emoji.get(status, '⚪️')} {status}: {count}\n"
     
+    # Quantiles come from the per-day sketches, not from the leads table
+    contact_times = sla.summarize(db.get_contact_time_counts(Config.SLA_REPORT_DAYS))
+    if contact_times['total'].count:
+        title = get_text(lang, 'contact_time_title').format(days=Config.SLA_REPORT_DAYS)
+        message += f"\n⏱ **{title}:**\n{_format_quantiles(contact_times['total'])}\n"
+        message += f"\n**{get_text(lang, 'by_status')}:**\n"
+        for status, sketch in sorted(contact_times['by_status'].items()):
+            message += f"{lead_cards.STATUS_EMOJI.get(status, '⚪️')} {status}: {_format_quantiles(sketch)}\n"
+        message += f"\n**{get_text(lang, 'by_service')}:**\n"
+        for service, sketch in sorted(contact_times['by_service'].items()):
+            message += f"• {escape_markdown(service)}: {_format_quantiles(sketch)}\n"
+    
     await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
 
 
+def _format_quantiles(sketch: sla.QuantileSketch) -> str:
+    p50, p90, p99 = (sla.format_duration(value) for value in sketch.quantiles())
+    return f"p50 {p50} · p90 {p90} · p99 {p99} (n={sketch.count})"
+
+
 @admin_only
 async def export_leads(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Export leads to CSV"""
-    init_db()
+    db = init_db(context)
     user = update.effective_user
     lang = db.get_user_language(user.id)
     
     try:
-        # Export to CSV
-        filename = db.export_to_csv()
+        # Export to CSV; one file per tenant so concurrent exports don't collide
+        filename = db.export_to_csv(f"leads_export_{get_tenant(context).name}.csv")
         
         if not filename:
             await update.message.reply_text(get_text(lang, 'no_leads'))
@@ -138,8 +280,20 @@ async def export_leads(update: Update, context: ContextTypes.DEFAULT_TYPE):
         import os
         os.remove(filename)
         
+        # Time-to-contact quantiles per day, status and service
+        filename = sla.export_to_csv(db.get_contact_time_counts(),
+                                     f"contact_times_{get_tenant(context).name}.csv")
+        if filename:
+            with open(filename, 'rb') as file:
+                await update.message.reply_document(
+                    document=file,
+                    filename='contact_times.csv',
+                    caption='⏱ Time to contact by day'
+                )
+            os.remove(filename)
+        
     except Exception as e:
-        logger.error(f"Error exporting leads: {e}")
+        logger.error("Error exporting leads: %s", e)
         await update.message.reply_text(get_text(lang, 'error'))
 
 
@@ -149,31 +303,39 @@ async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Broadcast a message to all users (admin command)
     Usage: /broadcast Your message here
     """
-    init_db()
+    db = init_db(context)
     if not context.args:
         await update.message.reply_text("Usage: /broadcast <message>")
         return
     
     message = ' '.join(context.args)
     
-    # Get all unique telegram IDs from leads
+    # Get all unique telegram IDs from leads; imported and anonymized
+    # leads have no chat to send to
     with db.get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT telegram_id FROM leads')
+        cursor.execute('SELECT DISTINCT telegram_id FROM leads_all WHERE telegram_id <> ?',
+                       (NO_TELEGRAM_ID,))
         user_ids = [row['telegram_id'] for row in cursor.fetchall()]
     
     # Send message to all users
     success_count = 0
     fail_count = 0
+    failures = Counter()
     
     for user_id in user_ids:
         try:
             await context.bot.send_message(chat_id=user_id, text=message)
             success_count += 1
         except Exception as e:
-            logger.error(f"Failed to send message to {user_id}: {e}")
+            logger.debug("Broadcast to %s failed: %s", user_id, e)
+            SEND_FAILURES.labels('broadcast').inc()
+            failures[type(e).__name__] += 1
             fail_count += 1
     
+    if failures:
+        logger.warning("Broadcast failed for %d of %d users: %s", fail_count, len(user_ids), dict(failures))
+    
     await update.message.reply_text(
         f"✅ Broadcast complete!\n"
         f"Sent: {success_count}\n"
@@ -181,11 +343,275 @@ async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@admin_only
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Start a CSV import (admin command)
+    Usage: /import, then send the CSV file
+    """
+    db = init_db(context)
+    lang = db.get_user_language(update.effective_user.id)
+    context.user_data['awaiting_import'] = True
+    await update.message.reply_text(get_text(lang, 'import_send_file'))
+
+
+@admin_only
+async def receive_import_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Import an uploaded CSV file in chunked transactions"""
+    db = init_db(context)
+    lang = db.get_user_language(update.effective_user.id)
+    
+    # Accept files right after /import or captioned with /import
+    caption = update.message.caption or ''
+    if not context.user_data.pop('awaiting_import', False) and not caption.startswith('/import'):
+        return
+    
+    status_message = await update.message.reply_text(get_text(lang, 'import_started'))
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    
+    loop = asyncio.get_running_loop()
+    last_report = [0.0]
+    
+    def report(result):
+        # Called from the worker thread after every committed batch
+        now = time.monotonic()
+        if now - last_report[0] < IMPORT_PROGRESS_INTERVAL:
+            return
+        last_report[0] = now
+        asyncio.run_coroutine_threadsafe(
+            status_message.edit_text(
+                get_text(lang, 'import_progress').format(
+                    done=result['rows_done'], imported=result['rows_imported']
+                )
+            ),
+            loop
+        )
+    
+    try:
+        telegram_file = await update.message.document.get_file()
+        await telegram_file.download_to_drive(path)
+        
+        started = time.monotonic()
+        live = settings.current()
+        result = await asyncio.to_thread(
+            import_csv, db, path, live.hot_keywords, live.warm_keywords,
+            Config.IMPORT_BATCH_SIZE, report
+        )
+        elapsed = time.monotonic() - started
+        
+        await update.message.reply_text(
+            f"📥 {format_summary(result)}\n\n⏱ {elapsed:.1f}s"
+        )
+    except CSVImportError as e:
+        await update.message.reply_text(f"❌ {e}")
+    except Exception as e:
+        # Committed batches are kept; sending the same file again resumes
+        logger.error("Error importing leads: %s", e)
+        await update.message.reply_text(get_text(lang, 'import_failed'))
+    finally:
+        os.remove(path)
+
+
+@admin_only
+async def db_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show the slowest SQL statements; /dbprofile reset clears the table"""
+    db = init_db(context)
+    lang = db.get_user_language(update.effective_user.id)
+    profiler = query_profiler.profiler
+    
+    if profiler is None:
+        await update.message.reply_text(get_text(lang, 'dbprofile_off'))
+        return
+    
+    if context.args and context.args[0] == 'reset':
+        profiler.reset()
+        await update.message.reply_text(get_text(lang, 'dbprofile_reset'))
+        return
+    
+    entries = profiler.top()
+    if not entries:
+        await update.message.reply_text(get_text(lang, 'dbprofile_empty'))
+        return
+    
+    # Plain text: SQL is full of characters Markdown would interpret
+    message = f"🐢 Top {len(entries)} queries by total time (slow >= {profiler.slow_threshold * 1000:g} ms)\n\n"
+    for i, entry in enumerate(entries, 1):
+        message += (
+            f"{i}. {entry['total_ms']:.1f} ms total, {entry['count']}x, "
+            f"avg {entry['avg_ms']:.2f} ms, max {entry['max_ms']:.2f} ms, slow {entry['slow']}\n"
+            f"   {entry['sql'][:200]}\n"
+        )
+        if entry['plan']:
+            message += f"   plan: {' | '.join(entry['plan'])}\n"
+        message += "\n"
+    
+    # Telegram messages are capped at 4096 characters
+    await update.message.reply_text(message[:4096])
+
+
+@admin_only
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Sample the running bot and send back a collapsed-stack profile
+    Usage: /profile <seconds>
+    
+    Registered with block=False, so updates keep being processed
+    (and profiled) while the session runs.
+    """
+    db = init_db(context)
+    lang = db.get_user_language(update.effective_user.id)
+    
+    try:
+        seconds = float(context.args[0]) if context.args else 10.0
+    except ValueError:
+        seconds = 0
+    if not 1 <= seconds <= Config.PROFILE_MAX_SECONDS:
+        await update.message.reply_text(
+            get_text(lang, 'profile_usage').format(max=Config.PROFILE_MAX_SECONDS)
+        )
+        return
+    
+    if sampling_profiler.active is not None:
+        await update.message.reply_text(get_text(lang, 'profile_busy'))
+        return
+    
+    await update.message.reply_text(get_text(lang, 'profile_started').format(seconds=f"{seconds:g}"))
+    profiler = await sampling_profiler.profile_for(seconds, Config.PROFILE_INTERVAL_MS / 1000)
+    if profiler is None:
+        await update.message.reply_text(get_text(lang, 'profile_busy'))
+        return
+    
+    caption = f"{profiler.samples} samples in {profiler.duration:.1f} s\n"
+    for label, spent, share in profiler.cumulative(limit=8):
+        caption += f"{share * 100:5.1f}% {spent:6.2f}s {label}\n"
+    
+    await update.message.reply_document(
+        document=io.BytesIO(profiler.collapsed().encode('utf-8')),
+        filename=f"profile_{time.strftime('%Y%m%d_%H%M%S')}.folded",
+        caption=caption[:1024]  # Telegram caption limit
+    )
+
+
+@admin_only
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Take an online database backup now and report its size and duration"""
+    db = init_db(context)
+    lang = db.get_user_language(update.effective_user.id)
+    
+    if db.backend != 'sqlite':
+        await update.message.reply_text(get_text(lang, 'backup_unsupported'))
+        return
+    
+    await update.message.reply_text(get_text(lang, 'backup_started'))
+    try:
+        result = await run_backup(db.db_path)
+    except Exception as e:
+        logger.error("Error backing up database: %s", e)
+        await update.message.reply_text(get_text(lang, 'backup_failed'))
+        return
+    
+    if result is None:
+        await update.message.reply_text(get_text(lang, 'backup_busy'))
+        return
+    
+    await update.message.reply_text(get_text(lang, 'backup_done').format(
+        name=os.path.basename(result.path),
+        size=result.size / (1024 * 1024),
+        duration=result.duration
+    ))
+
+
+def _format_seconds(seconds) -> str:
+    return '-' if seconds is None else f"{seconds:.0f}s"
+
+
+def _format_share(share) -> str:
+    return '-' if share is None else f"{share * 100:.0f}%"
+
+
+@admin_only
+async def funnel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Show lead form conversion per step by language and service
+    Usage: /funnel [days]
+    """
+    db = init_db(context)
+    lang = db.get_user_language(update.effective_user.id)
+    
+    try:
+        days = int(context.args[0]) if context.args else Config.FUNNEL_REPORT_DAYS
+    except ValueError:
+        days = Config.FUNNEL_REPORT_DAYS
+    days = max(1, days)
+    
+    # Include counts not flushed yet
+    tenant = get_tenant(context)
+    await asyncio.to_thread(tenant.funnel.flush, db)
+    funnel = summarize(await asyncio.to_thread(db.get_funnel_counts, days))
+    if not funnel['languages']:
+        await update.message.reply_text(get_text(lang, 'funnel_empty'))
+        return
+    
+    message = get_text(lang, 'funnel_title').format(days=days) + "\n\n"
+    for language, steps in sorted(funnel['languages'].items()):
+        message += f"[{language}] step: entered → next, cancelled, median time\n"
+        for step in steps:
+            message += (
+                f"  {step['step']}: {step['entered']} → {_format_share(step['conversion'])}, "
+                f"{step['cancelled']}, {_format_seconds(step['median'])}\n"
+            )
+        message += "\n"
+    
+    if funnel['services']:
+        message += "[service] description: entered → submitted, cancelled, median time\n"
+        for service, step in sorted(funnel['services'].items()):
+            message += (
+                f"  {service}: {step['entered']} → {_format_share(step['conversion'])}, "
+                f"{step['cancelled']}, {_format_seconds(step['median'])}\n"
+            )
+    
+    # Plain text: service names are user-facing strings; Telegram caps messages at 4096
+    await update.message.reply_text(message[:4096])
+
+
+@admin_only
+async def reload_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Reload keywords, services and admin IDs from SETTINGS_FILE
+    Only this process reloads; signal other replicas with SIGHUP
+    """
+    db = init_db(context)
+    lang = db.get_user_language(update.effective_user.id)
+    
+    try:
+        live = settings.reload()
+    except ValueError as e:
+        await update.message.reply_text(get_text(lang, 'reload_failed').format(error=e))
+        return
+    
+    await update.message.reply_text(get_text(lang, 'reload_done').format(
+        source=live.source,
+        hot=len(live.hot_keywords),
+        warm=len(live.warm_keywords),
+        services=sum(len(services) for services in live.services.values()),
+        admins=len(live.admin_ids)
+    ))
+
+
 # Admin command handlers
 admin_handlers = [
     CommandHandler('admin', admin_menu),
     CommandHandler('leads', show_leads),
     CommandHandler('stats', show_stats),
     CommandHandler('export', export_leads),
-    CommandHandler('broadcast', broadcast_message)
+    CommandHandler('broadcast', broadcast_message),
+    CommandHandler('import', import_command),
+    CommandHandler('dbprofile', db_profile),
+    CommandHandler('profile', profile_command, block=False),
+    CommandHandler('backup', backup_command, block=False),
+    CommandHandler('funnel', funnel_command),
+    CommandHandler('reload', reload_command),
+    MessageHandler(filters.Document.FileExtension('csv'), receive_import_file),
+    CallbackQueryHandler(lead_actions_callback, pattern=r'^(sel:|bulk:|contact_|archive_)')
 ]
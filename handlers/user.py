@@ -1,14 +1,16 @@
 from telegram import Update, KeyboardButton, ReplyKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters
-from database import Database
+from database import Database, CARD_COLUMNS
 from config import Config
+from metrics import SEND_FAILURES
+from handlers.admin import is_admin, send_lead_selection
+from tenancy import get_tenant
+import lead_cards
+import settings
+import sla
 
-db = None
-
-def init_db():
-    global db
-    if db is None:
-        db = Database()
+def init_db(context) -> Database:
+    return get_tenant(context).db
 
 def get_text(lang, key):
     return Config.TRANSLATIONS.get(lang, Config.TRANSLATIONS['en']).get(key, key)
@@ -21,11 +23,10 @@ STATE_SERVICE = 'service'
 STATE_DESCRIPTION = 'description'
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    init_db()
     context.user_data['state'] = STATE_NONE
     context.user_data['language'] = 'en'
     user_id = update.effective_user.id
-    db.save_user_language(user_id, 'en')
+    await get_tenant(context).writes.save_user_language(user_id, 'en')
     keyboard = [
         [KeyboardButton('👤 User')],
         [KeyboardButton('👑 Admin Panel (Demo)')]
@@ -36,19 +37,22 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    init_db()
+    db = init_db(context)
     text = update.message.text
     user_id = update.effective_user.id
     state = context.user_data.get('state', STATE_NONE)
+    funnel = get_tenant(context).funnel
     
     # === CANCEL BUTTON ===
     if '❌' in text:
+        funnel.abandon(context.user_data, 'cancel')
         context.user_data['state'] = STATE_NONE
         await update.message.reply_text('Cancelled.')
         return await show_role_menu(update, context)
     
     # === BACK BUTTON ===
     if '⬅️' in text:
+        funnel.abandon(context.user_data, 'back')
         context.user_data['state'] = STATE_NONE
         return await show_role_menu(update, context)
     
@@ -56,40 +60,38 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if state == STATE_NAME:
         context.user_data['name'] = text
         context.user_data['state'] = STATE_PHONE
+        funnel.advance(context.user_data, STATE_PHONE)
         await update.message.reply_text('Enter your phone number:')
         return
     
     if state == STATE_PHONE:
         context.user_data['phone'] = text
         context.user_data['state'] = STATE_SERVICE
-        services = Config.SERVICES.get('en', Config.SERVICES['en'])
-        keyboard = [[KeyboardButton(s)] for s in services]
-        keyboard.append([KeyboardButton('❌ Cancel')])
-        await update.message.reply_text('Select service:', reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
+        funnel.advance(context.user_data, STATE_SERVICE)
+        await update.message.reply_text('Select service:', reply_markup=settings.current().service_keyboard('en', cancel='❌ Cancel'))
         return
     
     if state == STATE_SERVICE:
         context.user_data['service'] = text
         context.user_data['state'] = STATE_DESCRIPTION
+        funnel.advance(context.user_data, STATE_DESCRIPTION)
         keyboard = [[KeyboardButton('❌ Cancel')]]
         await update.message.reply_text('Describe your task or project:', reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
         return
     
     if state == STATE_DESCRIPTION:
+        # Lead submissions have their own, much smaller budget
+        if not get_tenant(context).limiter.allow(user_id, 'lead'):
+            funnel.abandon(context.user_data, 'blocked')
+            context.user_data['state'] = STATE_NONE
+            await update.message.reply_text(get_text('en', 'rate_limited'))
+            return await show_role_menu(update, context)
+        
         # Save lead
         desc = text
-        status = 'COLD'
-        for kw in ['urgent', 'asap', 'important', 'quickly']:
-            if kw in desc.lower():
-                status = 'HOT'
-                break
-        if status == 'COLD':
-            for kw in ['soon', 'planning', 'interested']:
-                if kw in desc.lower():
-                    status = 'WARM'
-                    break
+        status = settings.current().classify(desc)
         
-        lead_id = db.save_lead(
+        lead_id = await get_tenant(context).writes.save_lead(
             telegram_id=user_id,
             telegram_username=update.effective_user.username,
             name=context.user_data.get('name', ''),
@@ -97,27 +99,23 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             service=context.user_data.get('service', ''),
             description=desc,
             status=status,
-            language='en'
+            language='en',
+            duplicate_window_hours=Config.DUPLICATE_WINDOW_HOURS,
+            merge_duplicates=Config.MERGE_DUPLICATE_LEADS
         )
         
         context.user_data['state'] = STATE_NONE
+        funnel.advance(context.user_data, 'submitted')
         await update.message.reply_text('✅ Thank you! Your request has been submitted.\nOur manager will contact you shortly.')
         
-        # Notify admins
-        lead = db.get_lead(lead_id)
-        for admin_id in Config.ADMIN_IDS:
+        # Notify admins; the card is formatted once for all of them
+        lead = db.get_lead(lead_id, columns=CARD_COLUMNS)
+        card = lead_cards.render(lead, 'notification', 'en', get_tenant(context).cards)
+        for admin_id in get_tenant(context).admins:
             try:
-                await context.bot.send_message(
-                    admin_id,
-                    f"🆕 New Lead #{lead_id}\n\n"
-                    f"👤 Name: {lead['name']}\n"
-                    f"📞 Phone: {lead['phone']}\n"
-                    f"🔧 Service: {lead['service']}\n"
-                    f"📝 Description: {lead['description']}\n"
-                    f"🌡️ Status: {lead['status']}"
-                )
+                await context.bot.send_message(admin_id, card, parse_mode=lead_cards.PARSE_MODE)
             except:
-                pass
+                SEND_FAILURES.labels('notification').inc()
         
         return await show_role_menu(update, context)
     
@@ -137,6 +135,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Leave request button -> Start collecting info
     if '📝' in text:
         context.user_data['state'] = STATE_NAME
+        funnel.enter(context.user_data, STATE_NAME)
         keyboard = [[KeyboardButton('❌ Cancel')]]
         await update.message.reply_text('Enter your name:', reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
         return
@@ -191,26 +190,35 @@ async def show_admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # === ADMIN FUNCTIONS ===
 
 async def admin_show_leads(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    init_db()
+    db = init_db(context)
     leads = db.get_recent_leads(limit=10)
     if not leads:
         await update.message.reply_text('No leads yet')
         return
     
+    cards = get_tenant(context).cards
     for lead in leads:
-        msg = f"🆔 #{lead['id']}\n👤 Name: {lead['name']}\n📞 Phone: {lead['phone']}\n🔧 Service: {lead['service']}\n📝 Description: {lead['description']}\n🌡️ Status: {lead['status']}\n📅 Date: {lead['created_at']}"
-        await update.message.reply_text(msg)
+        await update.message.reply_text(lead_cards.render(lead, 'detail', 'en', cards),
+                                        parse_mode=lead_cards.PARSE_MODE)
+    
+    # Bulk actions are only offered to real admins, not demo visitors
+    if is_admin(update.effective_user.id, context):
+        await send_lead_selection(update, context, [lead.id for lead in leads], 'en')
 
 async def admin_show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    init_db()
+    db = init_db(context)
     stats = db.get_stats()
     by_status = stats.get('by_status', {})
     msg = f"📊 Statistics\n\nTotal leads: {stats['total']}\nToday: {stats['today']}\nThis week: {stats['this_week']}\n\nBy status:\n🔥 HOT: {by_status.get('HOT', 0)}\n🌡️ WARM: {by_status.get('WARM', 0)}\n❄️ COLD: {by_status.get('COLD', 0)}"
+    contact_times = sla.summarize(db.get_contact_time_counts(Config.SLA_REPORT_DAYS))['total']
+    if contact_times.count:
+        p50, p90, p99 = (sla.format_duration(value) for value in contact_times.quantiles())
+        msg += f"\n\n⏱ Time to contact ({Config.SLA_REPORT_DAYS} days): p50 {p50} · p90 {p90} · p99 {p99}"
     await update.message.reply_text(msg)
 
 async def admin_export_leads(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    init_db()
-    filename = db.export_to_csv()
+    db = init_db(context)
+    filename = db.export_to_csv(f"leads_export_{get_tenant(context).name}.csv")
     with open(filename, 'rb') as f:
         await update.message.reply_document(document=f, filename='leads.csv', caption='📁 CSV file with leads')
 
@@ -0,0 +1,228 @@
+"""
+Import module for Telegram CRM Bot
+Bulk-loads leads from CSV files in the layout produced by export_to_csv
+
+Usage:
+    python importer.py leads.csv [--batch-size 5000] [--database-url sqlite:///crm_bot.db]
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from database import Database, CSV_HEADER, classify_leads, normalize_phone, open_database
+
+VALID_STATUSES = ('HOT', 'WARM', 'COLD')
+REQUIRED_COLUMNS = ('Name', 'Phone')
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+# Maximum number of row errors kept for the final report
+MAX_REPORTED_ERRORS = 20
+
+
+class CSVImportError(Exception):
+    """Raised when a file cannot be imported at all"""
+
+
+def file_checksum(path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parse_timestamp(value: str) -> str:
+    """Normalize a timestamp to SQLite's format, defaulting to now"""
+    value = value.strip()
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+    return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _parse_row(row: Dict[str, str], default_country_code: Optional[str]) -> Dict:
+    """
+    Validate and normalize one CSV row
+
+    Raises:
+        ValueError: If a required field is missing
+    """
+    name = (row.get('Name') or '').strip()
+    phone = (row.get('Phone') or '').strip()
+    if not name:
+        raise ValueError('missing name')
+    if not phone:
+        raise ValueError('missing phone')
+
+    username = (row.get('Telegram') or '').strip().lstrip('@')
+    status = (row.get('Status') or '').strip().upper()
+
+    return {
+        'telegram_username': None if username in ('', 'N/A') else username,
+        'name': name,
+        'phone': phone,
+        'phone_key': normalize_phone(phone, default_country_code) or '',
+        'service': (row.get('Service') or '').strip() or 'Other',
+        'description': (row.get('Description') or '').strip(),
+        'status': status if status in VALID_STATUSES else None,
+        'created_at': _parse_timestamp(row.get('Created') or ''),
+        'contacted': 1 if (row.get('Contacted') or '').strip().lower() in ('yes', '1', 'true') else 0
+    }
+
+
+def import_csv(db: Database, path: str, hot_keywords: List[str], warm_keywords: List[str],
+               batch_size: int = 5000,
+               progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Import leads from a CSV file in chunked transactions
+
+    The file is streamed, validated row by row and inserted in batches.
+    Progress is committed together with each batch, so running the same
+    file again resumes after the last committed batch instead of
+    inserting duplicates.
+
+    Args:
+        db: Target database
+        path: CSV file path
+        hot_keywords: Keywords for classifying rows without a status
+        warm_keywords: Keywords for classifying rows without a status
+        batch_size: Rows per transaction
+        progress: Called with the running totals after every batch
+
+    Returns:
+        Totals: rows_done, rows_imported, rows_skipped, resumed_from,
+        errors (first few row errors) and already_imported
+    """
+    job = db.get_import_job(file_checksum(path), os.path.basename(path))
+    result = {
+        'rows_done': job['rows_done'],
+        'rows_imported': job['rows_imported'],
+        'rows_skipped': job['rows_skipped'],
+        'resumed_from': job['rows_done'],
+        'errors': [],
+        'already_imported': bool(job['finished'])
+    }
+    if job['finished']:
+        return result
+
+    with open(path, newline='', encoding='utf-8-sig') as csvfile:
+        reader = csv.DictReader(csvfile)
+        header = reader.fieldnames or []
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise CSVImportError(
+                f"Missing columns {missing}; expected header: {','.join(CSV_HEADER)}"
+            )
+
+        batch = []
+        rows_seen = 0
+
+        for row in reader:
+            rows_seen += 1
+            # Skip rows committed by a previous, interrupted run
+            if rows_seen <= job['rows_done']:
+                continue
+
+            try:
+                batch.append(_parse_row(row, db.default_country_code))
+            except ValueError as e:
+                result['rows_skipped'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    # +1 for the header line
+                    result['errors'].append(f"line {rows_seen + 1}: {e}")
+
+            if rows_seen - result['rows_done'] >= batch_size:
+                _flush(db, job['id'], batch, rows_seen, result, hot_keywords, warm_keywords)
+                batch = []
+                if progress:
+                    progress(result)
+
+        if rows_seen > result['rows_done']:
+            _flush(db, job['id'], batch, rows_seen, result, hot_keywords, warm_keywords)
+            if progress:
+                progress(result)
+
+    db.finish_import_job(job['id'])
+    return result
+
+
+def _flush(db: Database, job_id: int, batch: List[Dict], rows_seen: int, result: Dict,
+           hot_keywords: List[str], warm_keywords: List[str]):
+    """Classify and insert one batch, then advance the totals"""
+    unclassified = [lead for lead in batch if lead['status'] is None]
+    statuses = classify_leads(
+        [lead['description'] for lead in unclassified], hot_keywords, warm_keywords
+    )
+    for lead, status in zip(unclassified, statuses):
+        lead['status'] = status
+
+    db.import_lead_batch(
+        job_id,
+        [(lead['telegram_username'], lead['name'], lead['phone'], lead['phone_key'],
+          lead['service'], lead['description'], lead['status'], lead['created_at'],
+          lead['contacted'])
+         for lead in batch],
+        rows_done=rows_seen,
+        rows_imported=result['rows_imported'] + len(batch),
+        rows_skipped=result['rows_skipped']
+    )
+    result['rows_done'] = rows_seen
+    result['rows_imported'] += len(batch)
+
+
+def format_summary(result: Dict) -> str:
+    """Human-readable summary of an import"""
+    if result['already_imported']:
+        return f"This file was already imported ({result['rows_imported']} leads)."
+
+    lines = [
+        f"Rows processed: {result['rows_done']}",
+        f"Imported: {result['rows_imported']}",
+        f"Skipped: {result['rows_skipped']}"
+    ]
+    if result['resumed_from']:
+        lines.append(f"Resumed after row {result['resumed_from']}")
+    if result['errors']:
+        lines.append('')
+        lines.extend(result['errors'])
+    return '\n'.join(lines)
+
+
+def main():
+    """Command-line entry point"""
+    from config import Config
+    import settings
+
+    parser = argparse.ArgumentParser(description='Import leads from a CSV export')
+    parser.add_argument('path', help='CSV file in the /export column layout')
+    parser.add_argument('--database-url', default=Config.DATABASE_URL)
+    parser.add_argument('--batch-size', type=int, default=Config.IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = open_database(args.database_url, Config.DEFAULT_COUNTRY_CODE)
+
+    def report(result):
+        print(f"... {result['rows_done']} rows, {result['rows_imported']} imported, "
+              f"{result['rows_skipped']} skipped", file=sys.stderr)
+
+    try:
+        live = settings.current()
+        result = import_csv(db, args.path, live.hot_keywords, live.warm_keywords,
+                            batch_size=args.batch_size, progress=report)
+    except CSVImportError as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(format_summary(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+Lead cards module for Telegram CRM Bot
+Renders leads for notifications, reminders and lists, with a memo cache
+"""
+
+import threading
+from collections import OrderedDict
+from html import escape
+from typing import Callable, Dict, List, Optional, Tuple
+
+from telegram.constants import ParseMode
+from config import Config
+from database import Lead
+from metrics import LEAD_CARD_RENDERS
+
+# Cards are HTML: only <, > and & need escaping, unlike MarkdownV2's
+# eighteen special characters
+PARSE_MODE = ParseMode.HTML
+
+STATUS_EMOJI = {'HOT': '🔥', 'WARM': '🌡', 'COLD': '❄️'}
+
+# Descriptions in list items are cut to this many characters
+SHORT_DESCRIPTION = 50
+
+# Placeholders are escaped lead fields plus the derived fields built in _fields()
+TEMPLATES = {
+    'en': {
+        'notification': (
+            '🆕 <b>New Lead #{id}</b>\n\n'
+            '👤 Name: {name}\n'
+            '📞 Phone: {phone}\n'
+            '🔧 Service: {service}\n'
+            '📝 Description: {description}\n'
+            '{status_emoji} Status: {status}'
+            '{duplicate_line}'
+        ),
+        'reminder_1h': (
+            '{reminder_1h}\n\n'
+            '<b>Lead #{id}</b>\n'
+            '👤 {name}\n'
+            '📱 {phone}\n'
+            '🔧 {service}\n'
+            '📝 {description}\n\n'
+            '{status_emoji} Status: {status}\n'
+            '{username_line}'
+            '🕐 Created: {created_at}'
+        ),
+        'list_item': (
+            '{status_emoji} <b>Lead #{id}</b> {contacted_emoji}\n'
+            '👤 {name}\n'
+            '📱 {phone}\n'
+            '🔧 {service}\n'
+            '📝 {short_description}\n'
+            '🕐 {created_at}\n'
+        ),
+        'detail': (
+            '🆔 #{id}\n'
+            '👤 Name: {name}\n'
+            '📞 Phone: {phone}\n'
+            '🔧 Service: {service}\n'
+            '📝 Description: {description}\n'
+            '🌡️ Status: {status}\n'
+            '📅 Date: {created_at}'
+        ),
+        'duplicate': '\n⚠️ Possible duplicate of #{duplicate_of}',
+        'list_header': '📋 <b>Recent Leads</b>\n\n',
+    },
+    'ru': {
+        'notification': (
+            '🆕 <b>Новая заявка #{id}</b>\n\n'
+            '👤 Имя: {name}\n'
+            '📞 Телефон: {phone}\n'
+            '🔧 Услуга: {service}\n'
+            '📝 Описание: {description}\n'
+            '{status_emoji} Статус: {status}'
+            '{duplicate_line}'
+        ),
+        'reminder_1h': (
+            '{reminder_1h}\n\n'
+            '<b>Заявка #{id}</b>\n'
+            '👤 {name}\n'
+            '📱 {phone}\n'
+            '🔧 {service}\n'
+            '📝 {description}\n\n'
+            '{status_emoji} Статус: {status}\n'
+            '{username_line}'
+            '🕐 Создана: {created_at}'
+        ),
+        'list_item': (
+            '{status_emoji} <b>Заявка #{id}</b> {contacted_emoji}\n'
+            '👤 {name}\n'
+            '📱 {phone}\n'
+            '🔧 {service}\n'
+            '📝 {short_description}\n'
+            '🕐 {created_at}\n'
+        ),
+        'detail': (
+            '🆔 #{id}\n'
+            '👤 Имя: {name}\n'
+            '📞 Телефон: {phone}\n'
+            '🔧 Услуга: {service}\n'
+            '📝 Описание: {description}\n'
+            '🌡️ Статус: {status}\n'
+            '📅 Дата: {created_at}'
+        ),
+        'duplicate': '\n⚠️ Возможный дубликат #{duplicate_of}',
+        'list_header': '📋 <b>Последние заявки</b>\n\n',
+    },
+}
+
+
+def _compile() -> Dict[Tuple[str, str], Callable[..., str]]:
+    """
+    Bind every template's format method once
+
+    Translated titles are substituted here, so rendering only fills in
+    lead fields.
+    """
+    compiled = {}
+    for lang, templates in TEMPLATES.items():
+        titles = {
+            key: escape(Config.TRANSLATIONS[lang][key], quote=False)
+            for key in ('reminder_1h', 'reminder_24h')
+        }
+        # The 24-hour reminder is the 1-hour card under a different title
+        templates = dict(
+            templates,
+            reminder_24h=templates['reminder_1h'].replace('{reminder_1h}', '{reminder_24h}')
+        )
+        for name, template in templates.items():
+            for key, title in titles.items():
+                template = template.replace('{' + key + '}', title)
+            compiled[(lang, name)] = template.format
+    return compiled
+
+
+_COMPILED = _compile()
+
+
+def _template(lang: str, name: str) -> Callable[..., str]:
+    return _COMPILED.get((lang, name)) or _COMPILED[('en', name)]
+
+
+def _fields(lead: Lead, lang: str) -> Dict[str, str]:
+    """Escaped lead fields and the derived values the templates use"""
+    description = lead.description or ''
+    short = description[:SHORT_DESCRIPTION] + ('...' if len(description) > SHORT_DESCRIPTION else '')
+    return {
+        'id': lead.id,
+        'name': escape(lead.name or '', quote=False),
+        'phone': escape(lead.phone or '', quote=False),
+        'service': escape(lead.service or '', quote=False),
+        'description': escape(description, quote=False),
+        'short_description': escape(short, quote=False),
+        'status': escape(lead.status or '', quote=False),
+        'status_emoji': STATUS_EMOJI.get(lead.status, '⚪️'),
+        'contacted_emoji': '✅' if lead.contacted else '⏳',
+        'created_at': escape(str(lead.created_at or ''), quote=False),
+        'username_line': f"💬 @{escape(lead.telegram_username, quote=False)}\n" if lead.telegram_username else '',
+        'duplicate_line': (_template(lang, 'duplicate')(duplicate_of=lead.duplicate_of)
+                           if lead.duplicate_of else ''),
+    }
+
+
+class CardCache:
+    """
+    LRU cache of rendered cards keyed by (lead_id, version, lang, template)
+
+    A lead's version changes whenever a field shown on its card does, so
+    entries never go stale; old versions simply age out. Lead IDs are per
+    database, so each tenant keeps its own cache.
+    """
+
+    def __init__(self, maxsize: int = Config.LEAD_CARD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cards = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple):
+        with self._lock:
+            card = self._cards.get(key)
+            if card is not None:
+                self._cards.move_to_end(key)
+            return card
+
+    def put(self, key: Tuple, card: str):
+        with self._lock:
+            self._cards[key] = card
+            self._cards.move_to_end(key)
+            if len(self._cards) > self.maxsize:
+                self._cards.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cards.clear()
+
+
+def render(lead: Lead, template: str, lang: str = 'en',
+           cache: Optional[CardCache] = None) -> str:
+    """
+    Render a lead as an HTML card; send it with parse_mode=PARSE_MODE
+
+    Args:
+        lead: Lead loaded with at least CARD_COLUMNS
+        template: 'notification', 'reminder_1h', 'reminder_24h',
+            'list_item' or 'detail'
+        lang: Language of the labels
+        cache: Cache of the tenant the lead belongs to; None renders
+            without caching
+
+    Returns:
+        The card text
+    """
+    # Leads loaded without a version can't be told apart from later edits
+    key = (lead.id, lead.version, lang, template) if cache is not None and lead.version is not None else None
+    if key is not None:
+        card = cache.get(key)
+        if card is not None:
+            LEAD_CARD_RENDERS.labels('hit').inc()
+            return card
+
+    card = _template(lang, template)(**_fields(lead, lang))
+    LEAD_CARD_RENDERS.labels('miss').inc()
+    if key is not None:
+        cache.put(key, card)
+    return card
+
+
+def render_list(leads: List[Lead], lang: str = 'en',
+                cache: Optional[CardCache] = None) -> str:
+    """Render several leads as one message of list items"""
+    separator = '─' * 30 + '\n\n'
+    return _template(lang, 'list_header')() + ''.join(
+        render(lead, 'list_item', lang, cache) + separator for lead in leads
+    )
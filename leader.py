@@ -0,0 +1,104 @@
+"""
+Leader election module for Telegram CRM Bot
+Keeps singleton jobs (reminders, rollups) running in exactly one replica
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import socket
+import time
+import uuid
+
+from telegram.ext import ContextTypes
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """
+    Lease-based leadership shared through the database
+
+    Every replica heartbeats the same named lease; whoever holds it runs
+    the singleton jobs. If the leader dies, its lease expires after `ttl`
+    seconds and the next replica to heartbeat takes over.
+
+    Leadership is also tracked locally: a replica stops considering itself
+    leader `margin` seconds before its last successful renewal would expire,
+    so a replica that can't reach the database steps down before anyone
+    else can take over.
+    """
+
+    def __init__(self, db: Database, name: str = 'singleton-jobs', ttl: float = 30.0,
+                 margin: float = 5.0):
+        """
+        Args:
+            db: Database holding the leases table
+            name: Lease name
+            ttl: Seconds a lease stays valid without renewal
+            margin: Seconds before expiry at which the holder steps down locally
+        """
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.margin = min(margin, ttl / 2)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._valid_until = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    def renew(self) -> bool:
+        """
+        Take or extend the lease
+
+        Returns:
+            True if this replica is the leader
+        """
+        was_leader = self.is_leader
+        started = time.monotonic()
+        try:
+            acquired = self.db.acquire_lease(self.name, self.holder, self.ttl)
+        except Exception as e:
+            # Outcome unknown: keep running until leadership lapses locally
+            logger.error("Lease %s heartbeat failed: %s", self.name, e)
+            acquired = None
+
+        if acquired:
+            self._valid_until = started + self.ttl - self.margin
+        elif acquired is False:
+            self._valid_until = 0.0
+
+        if acquired and not was_leader:
+            logger.info("Acquired lease %s as %s", self.name, self.holder)
+        elif was_leader and not self.is_leader:
+            logger.warning("Lost lease %s", self.name)
+        return self.is_leader
+
+    def release(self):
+        """Hand the lease back so another replica can take over immediately"""
+        if self.is_leader:
+            self._valid_until = 0.0
+            try:
+                self.db.release_lease(self.name, self.holder)
+                logger.info("Released lease %s", self.name)
+            except Exception as e:
+                logger.error("Failed to release lease %s: %s", self.name, e)
+
+    async def heartbeat(self, context: ContextTypes.DEFAULT_TYPE):
+        """Job callback; schedule every ttl / 3 seconds"""
+        await asyncio.to_thread(self.renew)
+
+
+def leader_only(lease: LeaderLease, callback):
+    """Wrap a job callback so it only runs in the replica holding the lease"""
+    @functools.wraps(callback)
+    async def wrapper(context: ContextTypes.DEFAULT_TYPE):
+        if not lease.is_leader:
+            logger.debug("Skipping %s: not the leader", callback.__name__)
+            return
+        return await callback(context)
+    return wrapper
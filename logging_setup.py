@@ -0,0 +1,125 @@
+"""
+Logging setup module for Telegram CRM Bot
+Routes log records through a queue so the event loop never blocks on stderr
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else came from `extra=`
+_STANDARD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread
+
+    The stock handler renders the message and traceback in the logging
+    thread before enqueueing. Records stay in-process here, so they are
+    passed through untouched and formatted by the listener instead.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class DuplicateFilter(logging.Filter):
+    """
+    Rate-limits repeated warnings and errors
+
+    Records are keyed by logger, level, unformatted message template and
+    exception type, so "Failed to send to %s" for a thousand recipients counts as one
+    message. The first occurrence in each window passes; the rest are
+    counted and reported on the next one that gets through.
+    """
+
+    def __init__(self, window: float = 60.0, min_level: int = logging.WARNING,
+                 max_keys: int = 1000):
+        super().__init__()
+        self.window = window
+        self.min_level = min_level
+        self.max_keys = max_keys
+        self._seen = {}  # key -> [window started at, suppressed count]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.min_level:
+            return True
+
+        exc_type = record.exc_info[0].__name__ if record.exc_info else None
+        key = (record.name, record.levelno, str(record.msg), exc_type)
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.window:
+                seen[1] += 1
+                return False
+            if seen is None and len(self._seen) >= self.max_keys:
+                self._seen.clear()
+            self._seen[key] = [now, 0]
+
+        if seen is not None and seen[1]:
+            record.suppressed = seen[1]
+            record.msg = f"{record.msg} (+{seen[1]} similar suppressed)"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra=` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = 'INFO', fmt: str = 'text',
+                  dedup_window: float = 60.0) -> Optional[QueueListener]:
+    """
+    Install a queue handler on the root logger and start its listener
+
+    Args:
+        level: Root log level name
+        fmt: 'text' or 'json'
+        dedup_window: Seconds to suppress repeats of a warning/error (0 disables)
+
+    Returns:
+        The running listener, or None if logging was already set up
+    """
+    root = logging.getLogger()
+    if any(isinstance(handler, DeferredQueueHandler) for handler in root.handlers):
+        return None
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    if dedup_window > 0:
+        handler.addFilter(DuplicateFilter(dedup_window))
+
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    listener = QueueListener(records, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
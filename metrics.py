@@ -0,0 +1,300 @@
+"""
+Metrics module for Telegram CRM Bot
+In-process counters and latency histograms, exposed in Prometheus text format
+"""
+
+import bisect
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast SQLite reads to slow Bot API calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the elapsed time of its block"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Get the child metric for a set of label values"""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        """Increment an unlabelled counter"""
+        self.labels().inc(amount)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {child.value:g}"
+            for values, child in self._samples()
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 registry: Optional['Registry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Observe a value on an unlabelled histogram"""
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, child in self._samples():
+            with child._lock:
+                counts = list(child.counts)
+                total, count = child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, values, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            plain = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{plain} {total:.6f}")
+            lines.append(f"{self.name}_count{plain} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# === Bot metrics ===
+
+HANDLER_SECONDS = Histogram(
+    'crm_handler_seconds', 'Time spent in each update handler', ('handler',))
+HANDLER_ERRORS = Counter(
+    'crm_handler_errors_total', 'Exceptions raised by update handlers', ('handler',))
+DB_METHOD_SECONDS = Histogram(
+    'crm_db_method_seconds', 'Time spent in each Database method', ('method',))
+BOT_API_SECONDS = Histogram(
+    'crm_bot_api_request_seconds', 'Outbound Bot API call latency', ('method',))
+BOT_API_ERRORS = Counter(
+    'crm_bot_api_errors_total', 'Failed outbound Bot API calls', ('method',))
+BOT_API_RETRIES = Counter(
+    'crm_bot_api_retries_total', 'Bot API calls retried after a transient error', ('method', 'reason'))
+BOT_API_POOL_WAIT = Histogram(
+    'crm_bot_api_pool_wait_seconds', 'Time Bot API requests waited for a pooled connection', ('pool',))
+LEADS_SAVED = Counter(
+    'crm_leads_saved_total', 'Leads saved, by status and source', ('status', 'source'))
+REMINDERS_SENT = Counter(
+    'crm_reminders_sent_total', 'Reminder messages delivered to admins', ('type',))
+SEND_FAILURES = Counter(
+    'crm_send_failures_total', 'Messages that could not be delivered', ('kind',))
+RATE_LIMITED = Counter(
+    'crm_rate_limited_total', 'Updates dropped by flood control', ('action',))
+LEAD_CARD_RENDERS = Counter(
+    'crm_lead_card_renders_total', 'Lead cards served from the render cache or formatted', ('result',))
+WRITE_BATCH_SIZE = Histogram(
+    'crm_write_batch_size', 'Writes committed together by the write queue',
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+WRITE_COMMIT_SECONDS = Histogram(
+    'crm_write_commit_seconds', 'Time to run and commit one write-queue batch')
+SETTINGS_RELOADS = Counter(
+    'crm_settings_reloads_total', 'Live settings reloads, by result', ('result',))
+
+
+def instrument_callback(callback):
+    """Wrap an async handler callback with latency and error metrics"""
+    module = callback.__module__.rsplit('.', 1)[-1]
+    label = f"{module}.{callback.__name__}"
+    latency = HANDLER_SECONDS.labels(label)
+    errors = HANDLER_ERRORS.labels(label)
+
+    @functools.wraps(callback)
+    async def timed(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - started)
+
+    timed.instrumented = True
+    return timed
+
+
+def instrument_methods(cls, histogram: Histogram, exclude: Tuple[str, ...] = ()):
+    """Wrap every public method defined on a class with a latency histogram"""
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or name in exclude or not callable(method):
+            continue
+
+        def wrap(func, child):
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - started)
+            return timed
+
+        setattr(cls, name, wrap(method, histogram.labels(name)))
+
+
+def start_metrics_server(host: str, port: int,
+                         registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serve GET /metrics from a background thread
+
+    Returns:
+        The running server
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info("Metrics available at http://%s:%s/metrics", host, server.server_address[1])
+    return server
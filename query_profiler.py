@@ -0,0 +1,174 @@
+"""
+Query profiling module for Telegram CRM Bot
+Opt-in statement timing, slow-query log and query-plan capture for SQLite
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Statements EXPLAIN QUERY PLAN can describe
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+# Upper bound on distinct statements tracked
+MAX_STATEMENTS = 500
+
+
+def _param_shape(params, many: bool = False) -> str:
+    """Describe bound parameters by type only, never by value"""
+    if many:
+        if isinstance(params, (list, tuple)):
+            first = _param_shape(params[0]) if params else '()'
+            return f"{len(params)} x {first}"
+        return 'iterator'
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{key}: {type(value).__name__}" for key, value in params.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in params) + ')'
+
+
+class QueryProfiler:
+    """
+    Aggregates statement timings and logs the slow ones
+
+    Timings cover cursor.execute/executemany, which for SQLite includes
+    running the statement up to its first result row.
+    """
+
+    def __init__(self, slow_threshold_ms: float, top_n: int = 10):
+        self.slow_threshold = slow_threshold_ms / 1000.0
+        self.top_n = top_n
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, conn: sqlite3.Connection, sql: str, params, elapsed: float, many: bool):
+        """Account one executed statement"""
+        key = ' '.join(sql.split())
+        shape = _param_shape(params, many)
+
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= MAX_STATEMENTS:
+                    return
+                entry = self._stats[key] = {
+                    'sql': key, 'count': 0, 'total': 0.0, 'max': 0.0,
+                    'slow': 0, 'shapes': set(), 'plan': None
+                }
+            entry['count'] += 1
+            entry['total'] += elapsed
+            entry['max'] = max(entry['max'], elapsed)
+            if len(entry['shapes']) < 5:
+                entry['shapes'].add(shape)
+            is_slow = elapsed >= self.slow_threshold
+            if is_slow:
+                entry['slow'] += 1
+            needs_plan = is_slow and entry['plan'] is None
+
+        if not is_slow:
+            return
+
+        if needs_plan:
+            plan = self._explain(conn, sql, params, many)
+            with self._lock:
+                entry['plan'] = plan
+        logger.warning(
+            "Slow query (%.1f ms) params=%s plan=%s: %s",
+            elapsed * 1000, shape, ' | '.join(entry['plan'] or []), key
+        )
+
+    def _explain(self, conn: sqlite3.Connection, sql: str, params, many: bool) -> List[str]:
+        keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        if keyword not in _EXPLAINABLE:
+            return []
+        if many:
+            # Plan for the first row of an executemany batch
+            params = params[0] if isinstance(params, (list, tuple)) and params else None
+            if params is None:
+                return []
+        try:
+            # Plain cursor, so the EXPLAIN itself isn't profiled
+            cursor = sqlite3.Cursor(conn)
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params or ())
+            return [row[3] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            return [f"unavailable: {e}"]
+
+    def top(self, n: Optional[int] = None) -> List[Dict]:
+        """Statements with the highest total time, slowest first"""
+        with self._lock:
+            entries = sorted(self._stats.values(), key=lambda entry: entry['total'], reverse=True)
+            return [
+                {
+                    'sql': entry['sql'],
+                    'count': entry['count'],
+                    'total_ms': entry['total'] * 1000,
+                    'avg_ms': entry['total'] / entry['count'] * 1000,
+                    'max_ms': entry['max'] * 1000,
+                    'slow': entry['slow'],
+                    'param_shapes': sorted(entry['shapes']),
+                    'plan': entry['plan']
+                }
+                for entry in entries[:n or self.top_n]
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that reports execute/executemany timings to the profiler"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            if profiler is not None:
+                profiler.record(self.connection, sql, parameters, time.perf_counter() - started, False)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            if profiler is not None:
+                profiler.record(self.connection, sql, seq_of_parameters,
+                                time.perf_counter() - started, True)
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute) are profiled"""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+
+# Process-wide profiler; None while profiling is off
+profiler = None
+
+
+def enable(slow_threshold_ms: float, top_n: int = 10) -> QueryProfiler:
+    """Turn on profiling for all connections opened from now on"""
+    global profiler
+    profiler = QueryProfiler(slow_threshold_ms, top_n)
+    logger.info("Query profiling enabled, slow query threshold %s ms", slow_threshold_ms)
+    return profiler
+
+
+def disable():
+    global profiler
+    profiler = None
+
+
+def connection_factory():
+    """Connection class for sqlite3.connect"""
+    return ProfilingConnection if profiler is not None else sqlite3.Connection
@@ -0,0 +1,109 @@
+"""
+Rate limiting module for Telegram CRM Bot
+Per-user token buckets that keep a single user from flooding lead intake
+"""
+
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from config import Config
+from metrics import RATE_LIMITED
+import tenancy  # not `from`: tenancy imports this module to build limiters
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter keyed by action and Telegram user ID
+
+    State is bounded: once max_users buckets exist, the least recently
+    active one is evicted. An active flooder always stays at the hot end
+    of the LRU order, so eviction only forgets idle users.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]], max_users: int = 10000):
+        """
+        Args:
+            limits: action -> (sustained rate per minute, burst size)
+            max_users: Maximum number of buckets kept in memory
+        """
+        self.limits = {
+            action: (per_minute / 60.0, burst)
+            for action, (per_minute, burst) in limits.items()
+        }
+        self.max_users = max_users
+        self._buckets = OrderedDict()  # (action, user_id) -> [tokens, updated_at]
+        self.allowed = Counter()
+        self.dropped = Counter()
+
+    def allow(self, user_id: int, action: str = 'message',
+              now: Optional[float] = None) -> bool:
+        """
+        Take one token from the user's bucket for this action
+
+        Returns:
+            True if the action may proceed, False if it should be dropped
+        """
+        limit = self.limits.get(action)
+        if limit is None:
+            return True
+
+        rate, burst = limit
+        if now is None:
+            now = time.monotonic()
+
+        key = (action, user_id)
+        bucket = self._buckets.get(key)
+
+        if bucket is None:
+            if len(self._buckets) >= self.max_users:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = [float(burst), now]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.allowed[action] += 1
+            return True
+
+        self.dropped[action] += 1
+        RATE_LIMITED.labels(action).inc()
+        return False
+
+    def stats(self) -> Dict:
+        """Counters for allowed and dropped actions"""
+        return {
+            'tracked_users': len(self._buckets),
+            'allowed': dict(self.allowed),
+            'dropped': dict(self.dropped)
+        }
+
+
+def limiter_from_config() -> RateLimiter:
+    """A limiter with RATE_LIMITS, one per tenant since user IDs are per bot"""
+    return RateLimiter(Config.RATE_LIMITS, Config.RATE_LIMIT_MAX_USERS)
+
+
+async def throttle_updates(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Drop updates from users over their message budget
+
+    Registered in handler group -1 so it runs before any handler touches
+    the database. Admins are never throttled.
+    """
+    user = update.effective_user
+    tenant = tenancy.get_tenant(context)
+    if user is None or tenant.is_admin(user.id):
+        return
+
+    if not tenant.limiter.allow(user.id, 'message'):
+        logger.debug("Dropping update %s from user %s: rate limited", update.update_id, user.id)
+        raise ApplicationHandlerStop
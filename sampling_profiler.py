@@ -0,0 +1,124 @@
+"""
+Sampling profiler module for Telegram CRM Bot
+Periodically samples the event loop thread's stack while a session is running
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# The session currently running, if any; nothing samples while this is None
+active = None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's call stack from a background thread
+
+    The profiled thread runs unmodified: there is no tracing hook, so the
+    cost is one stack walk per interval, paid by the sampler thread.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        """
+        Args:
+            thread_id: Ident of the thread to sample
+            interval: Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()  # root-first tuple of frame labels -> microseconds
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        started = last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            del frame
+            # Weight by wall time since the previous sample: the sampler gets
+            # the GIL late while the loop thread is busy in Python code, so
+            # plain sample counts would under-represent CPU-bound frames
+            now = time.perf_counter()
+            self.stacks[tuple(reversed(stack))] += int((now - last) * 1_000_000)
+            self.samples += 1
+            last = now
+        self.duration = time.perf_counter() - started
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> 'SamplingProfiler':
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope, weighted in µs"""
+        return ''.join(
+            f"{';'.join(stack)} {count}\n"
+            for stack, count in self.stacks.most_common()
+        )
+
+    def cumulative(self, limit: int = 15) -> List[Tuple[str, float, float]]:
+        """
+        Functions by time spent in them or their callees
+
+        Returns:
+            (function, seconds, share of sampled time) tuples
+        """
+        totals = Counter()
+        for stack, weight in self.stacks.items():
+            for label in set(stack):
+                totals[label] += weight
+        total = sum(self.stacks.values())
+        if not total:
+            return []
+        return [
+            (label, weight / 1_000_000, weight / total)
+            for label, weight in totals.most_common(limit)
+        ]
+
+
+async def profile_for(seconds: float, interval: float = 0.005) -> Optional[SamplingProfiler]:
+    """
+    Sample the calling event loop's thread for a number of seconds
+
+    Returns:
+        The finished profiler, or None if another session is already running
+    """
+    global active
+    if active is not None:
+        return None
+
+    profiler = active = SamplingProfiler(threading.get_ident(), interval)
+    logger.info("Sampling profiler started for %ss", seconds)
+    try:
+        profiler.start()
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+        active = None
+    logger.info("Sampling profiler collected %d samples", profiler.samples)
+    return profiler
@@ -0,0 +1,205 @@
+"""
+Live settings module for Telegram CRM Bot
+Keywords, services and admin IDs reloaded from a JSON file without a restart
+"""
+
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Pattern, Tuple
+
+from telegram import KeyboardButton, ReplyKeyboardMarkup
+from config import Config
+from metrics import SETTINGS_RELOADS
+
+logger = logging.getLogger(__name__)
+
+# Keys a settings file may contain; missing keys keep the Config defaults
+KEYS = ('hot_keywords', 'warm_keywords', 'services', 'admin_ids')
+
+# Descriptions longer than this many words are WARM without any keyword
+LONG_DESCRIPTION_WORDS = 20
+
+
+def _keyword_pattern(keywords: Tuple[str, ...]) -> Optional[Pattern]:
+    """One regex matching any keyword as a substring, like classify_lead"""
+    if not keywords:
+        return None
+    # Longest first, so a keyword is never shadowed by its own prefix
+    alternatives = sorted((re.escape(keyword) for keyword in keywords), key=len, reverse=True)
+    return re.compile('|'.join(alternatives))
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    One immutable snapshot of the tunables and the structures derived
+    from them
+
+    A reload builds a complete new snapshot and swaps it in, so a handler
+    that calls current() once sees one consistent version for the whole
+    update, whichever reload happens meanwhile.
+    """
+
+    hot_keywords: Tuple[str, ...]
+    warm_keywords: Tuple[str, ...]
+    services: Dict[str, Tuple[str, ...]]
+    admin_ids: Tuple[int, ...]
+    source: str = 'config.py'
+    _hot: Optional[Pattern] = field(default=None, repr=False, compare=False)
+    _warm: Optional[Pattern] = field(default=None, repr=False, compare=False)
+    _known_services: frozenset = field(default=frozenset(), repr=False, compare=False)
+    _keyboards: Dict = field(default_factory=dict, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, '_hot', _keyword_pattern(self.hot_keywords))
+        object.__setattr__(self, '_warm', _keyword_pattern(self.warm_keywords))
+        object.__setattr__(self, '_known_services', frozenset(
+            service for services in self.services.values() for service in services
+        ))
+
+    def classify(self, description: str) -> str:
+        """
+        Classify a lead description as HOT, WARM or COLD
+
+        Same rules as database.classify_lead, with the keyword lists
+        compiled into one regex each.
+        """
+        description_lower = description.lower()
+        if self._hot is not None and self._hot.search(description_lower):
+            return 'HOT'
+        if self._warm is not None and self._warm.search(description_lower):
+            return 'WARM'
+        if len(description.split()) > LONG_DESCRIPTION_WORDS:
+            return 'WARM'
+        return 'COLD'
+
+    def services_for(self, lang: str) -> Tuple[str, ...]:
+        """Services offered in a language, English when it has none"""
+        return self.services.get(lang) or self.services['en']
+
+    def service_label(self, service: str) -> str:
+        """The service if it is one of the offered ones, else 'other'"""
+        return service if service in self._known_services else 'other'
+
+    def service_keyboard(self, lang: str, cancel: Optional[str] = None) -> ReplyKeyboardMarkup:
+        """
+        Keyboard with one button per service, built once per snapshot
+
+        Args:
+            lang: Language of the service names
+            cancel: Text of a cancel button added as the last row
+        """
+        key = (lang, cancel)
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            rows = [[KeyboardButton(service)] for service in self.services_for(lang)]
+            if cancel:
+                rows.append([KeyboardButton(cancel)])
+            keyboard = self._keyboards.setdefault(key, ReplyKeyboardMarkup(rows, resize_keyboard=True))
+        return keyboard
+
+
+def _string_list(value, name: str) -> Tuple[str, ...]:
+    if not isinstance(value, list) or not all(isinstance(item, str) and item.strip() for item in value):
+        raise ValueError(f"{name} must be a list of non-empty strings")
+    return tuple(item.strip() for item in value)
+
+
+def parse(data: Dict, source: str = 'config.py') -> Settings:
+    """
+    Validate settings loaded from a file and build their snapshot
+
+    Args:
+        data: Decoded JSON object; missing keys keep the Config defaults
+        source: Where the data came from, for logs and /reload
+
+    Raises:
+        ValueError: If the data is malformed
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Settings must be a JSON object")
+    unknown = set(data) - set(KEYS)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+    hot = _string_list(data.get('hot_keywords', Config.HOT_KEYWORDS), 'hot_keywords')
+    warm = _string_list(data.get('warm_keywords', Config.WARM_KEYWORDS), 'warm_keywords')
+
+    services = data.get('services', Config.SERVICES)
+    if not isinstance(services, dict) or 'en' not in services:
+        raise ValueError("services must be an object of language -> list, including 'en'")
+    services = {lang: _string_list(names, f"services.{lang}") for lang, names in services.items()}
+    for lang, names in services.items():
+        if not names:
+            raise ValueError(f"services.{lang} must not be empty")
+        if len(set(names)) != len(names):
+            raise ValueError(f"services.{lang} has duplicate entries")
+
+    admin_ids = data.get('admin_ids', Config.ADMIN_IDS)
+    if (not isinstance(admin_ids, list) or
+            not all(isinstance(admin_id, int) and not isinstance(admin_id, bool) for admin_id in admin_ids)):
+        raise ValueError("admin_ids must be a list of integers")
+
+    return Settings(
+        hot_keywords=tuple(keyword.lower() for keyword in hot),
+        warm_keywords=tuple(keyword.lower() for keyword in warm),
+        services=services,
+        admin_ids=tuple(admin_ids),
+        source=source
+    )
+
+
+def load(path: str) -> Settings:
+    """
+    Read and validate a settings file
+
+    Raises:
+        ValueError: If the file is missing, not JSON or malformed
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Cannot read {path}: {e}") from e
+    return parse(data, source=path)
+
+
+_current: Optional[Settings] = None
+_reload_lock = threading.Lock()
+
+
+def current() -> Settings:
+    """The settings in effect; read it once per update and keep the snapshot"""
+    snapshot = _current
+    if snapshot is None:
+        snapshot = reload()
+    return snapshot
+
+
+def reload(path: Optional[str] = None) -> Settings:
+    """
+    Load SETTINGS_FILE (or `path`) and swap it in
+
+    On any error the previous settings stay in effect and the error is
+    raised to the caller.
+
+    Returns:
+        The new settings
+    """
+    global _current
+    path = path if path is not None else Config.SETTINGS_FILE
+    with _reload_lock:
+        try:
+            snapshot = load(path) if path else parse({})
+        except ValueError:
+            SETTINGS_RELOADS.labels('error').inc()
+            raise
+        _current = snapshot
+    SETTINGS_RELOADS.labels('ok').inc()
+    logger.info("Settings loaded from %s: %d hot and %d warm keywords, %d admins",
+                snapshot.source, len(snapshot.hot_keywords), len(snapshot.warm_keywords),
+                len(snapshot.admin_ids))
+    return snapshot
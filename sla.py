@@ -0,0 +1,148 @@
+"""
+SLA module for Telegram CRM Bot
+Time-to-contact quantiles from mergeable per-day sketches
+"""
+
+import csv
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import settings
+
+# Quantiles are reported within this relative error of the true value
+RELATIVE_ACCURACY = 0.01
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+EXPORT_HEADER = ['Day', 'Status', 'Service', 'Contacted', 'P50 (s)', 'P90 (s)', 'P99 (s)']
+
+
+def bucket_of(seconds: float) -> int:
+    """
+    Sketch bucket of a duration: bucket i holds (GAMMA^(i-1), GAMMA^i]
+    seconds, so its midpoint is within RELATIVE_ACCURACY of any value in
+    it. Everything up to one second shares bucket 0.
+    """
+    if seconds <= 1:
+        return 0
+    return math.ceil(math.log(seconds) / _LOG_GAMMA)
+
+
+def bucket_value(bucket: int) -> float:
+    """Representative duration of a bucket in seconds"""
+    return 2 * _GAMMA ** bucket / (_GAMMA + 1)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch)
+
+    Bucket counts are all it stores, so sketches of different days,
+    statuses or services merge by adding counts, and the stored per-day
+    rows can be combined into any range without touching the leads.
+    """
+
+    def __init__(self):
+        self.buckets = Counter()
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets.values())
+
+    def add(self, seconds: float, count: int = 1):
+        self.buckets[bucket_of(seconds)] += count
+
+    def merge(self, other: 'QuantileSketch'):
+        self.buckets.update(other.buckets)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Returns:
+            Seconds, or None for an empty sketch
+        """
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return bucket_value(bucket)
+        return bucket_value(max(self.buckets))
+
+    def quantiles(self) -> Tuple[Optional[float], ...]:
+        """p50, p90 and p99"""
+        return tuple(self.quantile(q) for q in QUANTILES)
+
+
+def summarize(rows: Iterable[Dict]) -> Dict:
+    """
+    Merge contact_time_daily rows into sketches
+
+    Args:
+        rows: Dicts with day, status, service, bucket and count
+
+    Returns:
+        {'total': sketch, 'by_status': {status: sketch},
+         'by_service': {service: sketch}, 'by_day': {day: sketch}}
+    """
+    # Free-text services are grouped as 'other' so the breakdown stays short
+    service_label = settings.current().service_label
+    summary = {
+        'total': QuantileSketch(),
+        'by_status': defaultdict(QuantileSketch),
+        'by_service': defaultdict(QuantileSketch),
+        'by_day': defaultdict(QuantileSketch),
+    }
+    for row in rows:
+        bucket, count = row['bucket'], row['count']
+        for sketch in (summary['total'],
+                       summary['by_status'][row['status']],
+                       summary['by_service'][service_label(row['service'])],
+                       summary['by_day'][row['day']]):
+            sketch.buckets[bucket] += count
+    return summary
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Compact duration such as 45s, 12m, 3.5h or 2.1d"""
+    if seconds is None:
+        return '-'
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+
+def export_to_csv(rows: Iterable[Dict], filename: str) -> Optional[str]:
+    """
+    Write p50/p90/p99 time to contact per day, status and service
+
+    Returns:
+        Filename of exported file, or None without data
+    """
+    service_label = settings.current().service_label
+    sketches = defaultdict(QuantileSketch)
+    for row in rows:
+        sketches[(row['day'], row['status'], service_label(row['service']))].buckets[row['bucket']] += row['count']
+    if not sketches:
+        return None
+
+    lines: List[List] = []
+    for (day, status, service), sketch in sorted(sketches.items(), reverse=True):
+        lines.append([day, status, service, sketch.count] +
+                     [f"{value:.0f}" for value in sketch.quantiles()])
+
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(EXPORT_HEADER)
+        writer.writerows(lines)
+    return filename
@@ -0,0 +1,137 @@
+"""
+Tenancy module for Telegram CRM Bot
+Describes the bots served by one process and gives handlers their tenant
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from telegram.ext import ContextTypes
+from config import Config
+from database import Database, open_database
+from funnel import FunnelRecorder
+from lead_cards import CardCache
+import rate_limiter
+import settings
+from write_queue import WriteQueue
+
+_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+@dataclass
+class Tenant:
+    """
+    One bot: its token, admins and isolated storage
+
+    Code, translations and the lead classifier are shared by all tenants;
+    only these fields differ.
+    """
+
+    name: str
+    token: str = field(repr=False)
+    admin_ids: Optional[List[int]]  # None: ADMIN_IDS from the live settings
+    database_url: str = ''
+    _db: Optional[Database] = field(default=None, repr=False, compare=False)
+    _writes: Optional[WriteQueue] = field(default=None, repr=False, compare=False)
+    _limiter: Optional['rate_limiter.RateLimiter'] = field(default=None, repr=False, compare=False)
+    funnel: FunnelRecorder = field(default_factory=FunnelRecorder, repr=False, compare=False)
+    cards: CardCache = field(default_factory=CardCache, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not _NAME_PATTERN.match(self.name):
+            raise ValueError(f"Invalid tenant name {self.name!r}")
+        if not self.token:
+            raise ValueError(f"Tenant {self.name} has no token")
+        if self.admin_ids is not None:
+            self.admin_ids = [int(admin_id) for admin_id in self.admin_ids]
+        if not self.database_url:
+            self.database_url = f"sqlite:///crm_{self.name}.db"
+
+    @property
+    def db(self) -> Database:
+        """The tenant's database, opened on first use"""
+        if self._db is None:
+            self._db = open_database(self.database_url, Config.DEFAULT_COUNTRY_CODE)
+        return self._db
+
+    @property
+    def writes(self) -> WriteQueue:
+        """Group-commit queue for the writes handlers make while serving users"""
+        if self._writes is None:
+            self._writes = WriteQueue(
+                self.db,
+                window=Config.WRITE_QUEUE_WINDOW_MS / 1000,
+                max_batch=Config.WRITE_QUEUE_MAX_BATCH,
+                synchronous=Config.WRITE_SYNCHRONOUS
+            )
+        return self._writes
+
+    @property
+    def limiter(self) -> 'rate_limiter.RateLimiter':
+        """Rate limiter for this bot's users, with its own bucket budget"""
+        if self._limiter is None:
+            self._limiter = rate_limiter.limiter_from_config()
+        return self._limiter
+
+    @property
+    def admins(self) -> List[int]:
+        """Admin IDs in effect, following settings reloads unless set per tenant"""
+        if self.admin_ids is not None:
+            return self.admin_ids
+        return list(settings.current().admin_ids)
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.admins
+
+
+def tenant_from_config() -> Tenant:
+    """The single tenant described by TOKEN, ADMIN_IDS and DATABASE_URL"""
+    return Tenant(
+        name='default',
+        token=Config.TOKEN,
+        admin_ids=None,
+        database_url=Config.DATABASE_URL
+    )
+
+
+def load_tenants(path: str) -> List[Tenant]:
+    """
+    Load tenants from a JSON file
+
+    The file holds a list of objects with `name`, `token`, and optionally
+    `admin_ids` (default: ADMIN_IDS from the live settings) and
+    `database_url` (default: sqlite:///crm_<name>.db).
+
+    Raises:
+        ValueError: If the file is malformed or tenants collide
+    """
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path} must contain a non-empty list of tenants")
+
+    tenants = []
+    for entry in entries:
+        try:
+            tenants.append(Tenant(
+                name=entry['name'],
+                token=entry['token'],
+                admin_ids=entry.get('admin_ids'),
+                database_url=entry.get('database_url', '')
+            ))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid tenant entry in {path}: {e}") from e
+
+    for attribute in ('name', 'token', 'database_url'):
+        values = [getattr(tenant, attribute) for tenant in tenants]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Tenants in {path} must have distinct {attribute} values")
+    return tenants
+
+
+def get_tenant(context: ContextTypes.DEFAULT_TYPE) -> Tenant:
+    """The tenant whose bot received the current update or runs the job"""
+    return context.bot_data['tenant']
@@ -0,0 +1,180 @@
+"""
+Transport module for Telegram CRM Bot
+HTTP request objects used for Bot API calls
+"""
+
+import asyncio
+import random
+import time
+from typing import Optional
+
+import httpx
+from telegram.error import NetworkError
+from telegram.request import HTTPXRequest
+from config import Config
+from metrics import BOT_API_SECONDS, BOT_API_ERRORS, BOT_API_POOL_WAIT, BOT_API_RETRIES
+
+# Gateway errors Telegram returns while it is restarting or overloaded
+RETRY_STATUS_CODES = frozenset((502, 503, 504))
+
+# Upper bound for a single backoff sleep, in seconds
+MAX_BACKOFF = 10.0
+
+
+def _retry_reason(error: NetworkError) -> Optional[str]:
+    """Why a failed call is safe to retry, or None if it may have reached Telegram"""
+    cause = error.__cause__
+    if isinstance(cause, httpx.PoolTimeout):
+        return 'pool_timeout'
+    if isinstance(cause, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return 'connect'
+    return None
+
+
+class PoolWaitTransport(httpx.AsyncHTTPTransport):
+    """
+    Transport that measures how long requests queue for a pooled connection
+
+    httpcore emits its first trace event once the request holds a
+    connection (connect_tcp for a new one, send_request_headers for a
+    reused one), so the time until then is the pool wait.
+    """
+
+    def __init__(self, pool: str, **kwargs):
+        super().__init__(**kwargs)
+        self.wait_time = BOT_API_POOL_WAIT.labels(pool)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        acquired = False
+
+        async def trace(event: str, info: dict):
+            nonlocal acquired
+            if not acquired:
+                acquired = True
+                self.wait_time.observe(time.perf_counter() - started)
+
+        request.extensions = {**request.extensions, 'trace': trace}
+        return await super().handle_async_request(request)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """
+    HTTPXRequest that records latency and failures per Bot API method
+
+    Calls that provably never reached Telegram (connect errors, pool
+    timeouts) and gateway errors are retried with full-jitter exponential
+    backoff. Read/write timeouts are not retried: the message may already
+    have been delivered.
+    """
+
+    def __init__(self, connection_pool_size: int = 1, pool: str = 'outbound',
+                 retries: int = 0, retry_backoff: float = 0.5,
+                 keepalive_expiry: Optional[float] = 5.0, http2: bool = False, **kwargs):
+        """
+        Args:
+            connection_pool_size: Maximum open connections
+            pool: Label for pool metrics, e.g. 'outbound' or 'updates'
+            retries: Extra attempts for retryable failures
+            retry_backoff: Base backoff in seconds, doubled per attempt
+            keepalive_expiry: Seconds an idle connection is kept open (0 disables keep-alive)
+            http2: Use HTTP/2 (needs python-telegram-bot[http2])
+            **kwargs: Timeouts and other HTTPXRequest arguments
+        """
+        super().__init__(connection_pool_size=connection_pool_size,
+                         http_version='2' if http2 else '1.1', **kwargs)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+
+        limits = httpx.Limits(
+            max_connections=connection_pool_size,
+            max_keepalive_connections=connection_pool_size if keepalive_expiry else 0,
+            keepalive_expiry=keepalive_expiry or None
+        )
+        # HTTPXRequest builds its client from these kwargs, also on re-initialize
+        self._client_kwargs['limits'] = limits
+        self._client_kwargs['transport'] = PoolWaitTransport(
+            pool, limits=limits, http1=not http2, http2=http2
+        )
+        self._client = self._build_client()
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                try:
+                    code, payload = await super().do_request(url, method, *args, **kwargs)
+                except NetworkError as e:
+                    reason = _retry_reason(e)
+                    if reason is None or last_attempt:
+                        raise
+                else:
+                    if code not in RETRY_STATUS_CODES or last_attempt:
+                        break
+                    reason = str(code)
+
+                BOT_API_RETRIES.labels(api_method, reason).inc()
+                await asyncio.sleep(random.uniform(0, min(MAX_BACKOFF, self.retry_backoff * 2 ** attempt)))
+        except Exception:
+            BOT_API_ERRORS.labels(api_method).inc()
+            raise
+        finally:
+            BOT_API_SECONDS.labels(api_method).observe(time.perf_counter() - started)
+
+        if code >= 400:
+            BOT_API_ERRORS.labels(api_method).inc()
+        return code, payload
+
+
+class SharedRequest(InstrumentedRequest):
+    """
+    Request object shared by several bots in one process
+
+    Each Bot initializes and shuts down its request objects; the
+    underlying connection pool is closed only when the last bot using it
+    shuts down.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._users = 0
+
+    async def initialize(self):
+        self._users += 1
+        if self._users == 1:
+            await super().initialize()
+
+    async def shutdown(self):
+        self._users = max(0, self._users - 1)
+        if self._users == 0:
+            await super().shutdown()
+
+
+def request_from_config(pool: str = 'outbound', shared: bool = False,
+                        pool_size: Optional[int] = None) -> InstrumentedRequest:
+    """
+    Build a request object with the BOT_API_* settings from Config
+
+    Args:
+        pool: 'outbound' for API calls or 'updates' for getUpdates long polling
+        shared: Return a SharedRequest for use by several bots
+        pool_size: Override the configured pool size
+    """
+    updates = pool == 'updates'
+    request_class = SharedRequest if shared else InstrumentedRequest
+    return request_class(
+        connection_pool_size=pool_size or (Config.BOT_API_UPDATES_POOL_SIZE if updates
+                                           else Config.BOT_API_POOL_SIZE),
+        pool=pool,
+        # The updater already retries getUpdates on network errors
+        retries=0 if updates else Config.BOT_API_RETRIES,
+        retry_backoff=Config.BOT_API_RETRY_BACKOFF,
+        keepalive_expiry=Config.BOT_API_KEEPALIVE_SECONDS,
+        http2=Config.BOT_API_HTTP2,
+        connect_timeout=Config.BOT_API_CONNECT_TIMEOUT,
+        read_timeout=Config.BOT_API_READ_TIMEOUT,
+        write_timeout=Config.BOT_API_WRITE_TIMEOUT,
+        pool_timeout=Config.BOT_API_POOL_TIMEOUT
+    )
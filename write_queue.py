@@ -0,0 +1,158 @@
+"""
+Write queue module for Telegram CRM Bot
+Group-commits lead and preference writes from all handlers
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional, Tuple
+
+from database import Database
+from metrics import WRITE_BATCH_SIZE, WRITE_COMMIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# One queued call; the queue also carries None, asking the writer to stop
+_Write = Tuple[Callable, tuple, dict, asyncio.Future]
+
+
+class WriteQueue:
+    """
+    Single writer task that commits concurrent writes together
+
+    Handlers await a write as if it were a direct call. The writer takes
+    the first pending write, gathers more for up to `window` seconds or
+    until `max_batch` are queued, runs them in one transaction off the
+    event loop and resolves each caller's future once the batch commits.
+    A burst of N writes then costs one lock acquisition and one sync
+    instead of N.
+
+    Each write runs in its own savepoint, so a failing write raises for
+    its caller only; if the commit itself fails, every caller in the
+    batch gets the error.
+    """
+
+    def __init__(self, db: Database, window: float = 0.005, max_batch: int = 100,
+                 synchronous: Optional[str] = None):
+        """
+        Args:
+            db: Database the writes go to
+            window: Seconds to wait for more writes after the first one
+            max_batch: Maximum writes per transaction
+            synchronous: Durability level passed to Database.batch()
+        """
+        self.db = db
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.synchronous = synchronous or None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def submit(self, method: Callable, *args, **kwargs):
+        """
+        Queue a call to a Database method and wait until it is committed
+
+        Returns:
+            Whatever the method returned
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._run(), name='write_queue')
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((method, args, kwargs, future))
+        return await future
+
+    async def save_lead(self, *args, **kwargs) -> int:
+        """Database.save_lead through the queue"""
+        return await self.submit(self.db.save_lead, *args, **kwargs)
+
+    async def save_user_language(self, telegram_id: int, language: str):
+        """Database.save_user_language through the queue"""
+        return await self.submit(self.db.save_user_language, telegram_id, language)
+
+    async def mark_contacted(self, lead_id: int) -> bool:
+        """Database.mark_contacted through the queue"""
+        return await self.submit(self.db.mark_contacted, lead_id)
+
+    async def mark_reminder_sent(self, lead_id: int, reminder_type: int):
+        """Database.mark_reminder_sent through the queue"""
+        return await self.submit(self.db.mark_reminder_sent, lead_id, reminder_type)
+
+    async def mark_contacted_many(self, lead_ids: List[int]) -> int:
+        """Database.mark_contacted_many through the queue"""
+        return await self.submit(self.db.mark_contacted_many, lead_ids)
+
+    async def archive_leads(self, lead_ids: List[int]) -> int:
+        """Database.archive_leads through the queue"""
+        return await self.submit(self.db.archive_leads, lead_ids)
+
+    async def assign_leads(self, lead_ids: List[int], admin_id: int) -> int:
+        """Database.assign_leads through the queue"""
+        return await self.submit(self.db.assign_leads, lead_ids, admin_id)
+
+    async def close(self):
+        """Commit everything already queued and stop the writer"""
+        if self._writer is not None and not self._writer.done():
+            self._queue.put_nowait(None)
+            await self._writer
+        self._writer = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            write = await self._queue.get()
+            if write is None:
+                break
+            batch = [write]
+
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    write = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        write = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if write is None:
+                    closing = True
+                    break
+                batch.append(write)
+
+            await self._commit(batch)
+
+    async def _commit(self, batch: List[_Write]):
+        started = time.perf_counter()
+        try:
+            results = await asyncio.to_thread(self._apply, batch)
+        except Exception as e:
+            logger.error("Write batch of %d failed to commit: %s", len(batch), e)
+            results = [(None, e)] * len(batch)
+        WRITE_COMMIT_SECONDS.observe(time.perf_counter() - started)
+        WRITE_BATCH_SIZE.observe(len(batch))
+
+        for (_, _, _, future), (result, error) in zip(batch, results):
+            if future.done():  # The caller was cancelled; the write still happened
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _apply(self, batch: List[_Write]) -> List[Tuple]:
+        """Run a batch in one transaction; returns (result, error) per write"""
+        results = []
+        with self.db.batch(self.synchronous):
+            for method, args, kwargs, _ in batch:
+                try:
+                    results.append((method(*args, **kwargs), None))
+                except Exception as e:
+                    results.append((None, e))
+        return results